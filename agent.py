@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Headless monitoring agent
+
+Samples this machine with SystemMonitor every INTERVAL seconds and pushes the
+samples in batches to a central dashboard's /api/ingest endpoint. Samples that
+cannot be delivered are kept (up to --buffer) and retried with the next batch;
+a batch the server rejects with a client error is logged and dropped.
+
+    python agent.py --server http://dashboard.example:5000 --token "$INGEST_TOKEN"
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+
+from utils.system_monitor import SystemMonitor
+from utils.wire_format import CONTENT_TYPE, encode_batch
+
+SYSTEM_INFO_INTERVAL = 300
+MAX_BACKOFF_SECONDS = 60
+# Client errors that are worth retrying; any other 4xx rejects the batch for good
+RETRY_STATUSES = (408, 429)
+
+
+class Agent:
+    def __init__(self, server, host, token=None, interval=1.0, batch_seconds=10.0, buffer_size=3600, timeout=10.0,
+                 wire_format='binary', compress=False):
+        self.url = server.rstrip('/') + '/api/ingest'
+        self.host = host
+        self.token = token
+        self.interval = interval
+        self.batch_seconds = batch_seconds
+        self.timeout = timeout
+        self.wire_format = wire_format
+        self.compress = compress
+        self.monitor = SystemMonitor()
+        self.pending = deque(maxlen=buffer_size)
+        self._system_info_sent = 0.0
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def sample(self):
+        network = self.monitor.get_network_activity()
+        self.pending.append((
+            time.time(),
+            self.monitor.get_cpu_usage(interval=None)['percentage'],
+            self.monitor.get_ram_usage()['percentage'],
+            self.monitor.get_disk_usage()['percentage'],
+            network['upload_speed'],
+            network['download_speed']
+        ))
+
+    def push(self):
+        if not self.pending:
+            return True
+        rows = list(self.pending)
+        send_info = time.monotonic() - self._system_info_sent >= SYSTEM_INFO_INTERVAL
+        system_info = self.monitor.get_system_info() if send_info else None
+
+        request = urllib.request.Request(self.url, data=self.encode(rows, system_info), method='POST')
+        request.add_header('Content-Type', CONTENT_TYPE if self.wire_format == 'binary' else 'application/json')
+        if self.token:
+            request.add_header('Authorization', f'Bearer {self.token}')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as error:
+            if error.code >= 500 or error.code in RETRY_STATUSES:
+                print(f"⚠️  Push to {self.url} failed ({error}); {len(self.pending)} samples buffered")
+                return False
+            # The server rejected this batch and will again: retrying it would
+            # hold back every sample queued behind it
+            detail = error.read()[:200].decode('utf-8', 'replace')
+            print(f"❌ Push to {self.url} rejected ({error}: {detail}); dropped {len(rows)} samples")
+            for _ in rows:
+                self.pending.popleft()
+            return True
+        except (urllib.error.URLError, OSError) as error:
+            print(f"⚠️  Push to {self.url} failed ({error}); {len(self.pending)} samples buffered")
+            return False
+
+        for _ in rows:
+            self.pending.popleft()
+        if send_info:
+            self._system_info_sent = time.monotonic()
+        return True
+
+    def encode(self, rows, system_info=None):
+        if self.wire_format == 'binary':
+            return encode_batch(self.host, rows, system_info, compress=self.compress)
+        payload = {'host': self.host, 'samples': rows}
+        if system_info is not None:
+            payload['system_info'] = system_info
+        return json.dumps(payload, separators=(',', ':')).encode()
+
+    def run(self):
+        # Prime the CPU counters so the first non-blocking reading is meaningful
+        self.monitor.get_cpu_usage(interval=0.1)
+        backoff = self.batch_seconds
+        next_sample = time.monotonic()
+        # Spread many agents' pushes across the batch window
+        next_push = next_sample + random.uniform(0, self.batch_seconds)
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_sample:
+                self.sample()
+                next_sample += self.interval
+                if next_sample < now:
+                    next_sample = now + self.interval
+            if now >= next_push:
+                if self.push():
+                    backoff = self.batch_seconds
+                else:
+                    backoff = min(backoff * 2, MAX_BACKOFF_SECONDS)
+                next_push = time.monotonic() + backoff
+            self._stop.wait(max(0.0, min(next_sample, next_push) - time.monotonic()))
+
+        self.push()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', default=os.environ.get('AGENT_SERVER', 'http://127.0.0.1:5000'))
+    parser.add_argument('--token', default=os.environ.get('INGEST_TOKEN'))
+    parser.add_argument('--host', default=os.environ.get('AGENT_HOST', socket.gethostname()),
+                        help='name this machine is stored under on the central dashboard')
+    parser.add_argument('--interval', type=float, default=float(os.environ.get('COLLECTOR_INTERVAL', 1.0)))
+    parser.add_argument('--batch-seconds', type=float, default=float(os.environ.get('AGENT_BATCH_SECONDS', 10)))
+    parser.add_argument('--buffer', type=int, default=3600, help='samples kept while the server is unreachable')
+    parser.add_argument('--format', choices=('binary', 'json'), default=os.environ.get('AGENT_FORMAT', 'binary'))
+    parser.add_argument('--compress', action='store_true', help='zlib-compress binary batches')
+    args = parser.parse_args()
+
+    agent = Agent(args.server, args.host, token=args.token, interval=args.interval,
+                  batch_seconds=args.batch_seconds, buffer_size=args.buffer,
+                  wire_format=args.format, compress=args.compress)
+    signal.signal(signal.SIGTERM, lambda signum, frame: agent.stop())
+
+    print(f"📡 Agent {args.host} sampling every {args.interval}s, pushing to {agent.url} every {args.batch_seconds}s")
+    try:
+        agent.run()
+    except KeyboardInterrupt:
+        agent.stop()
+        agent.push()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,75 @@
 from flask import Flask, render_template, session
-from models.database import db, init_database
+from models.database import db, init_database, db_writes
+from models.metrics_store import metrics_store
+from utils.alert_engine import alert_engine
+from utils.anomaly import anomaly_watcher
+from utils.summary import metric_summaries
+from utils.snapshot_channel import default_snapshot_path
+from utils.instrumentation import instrumentation
+from utils.password_pool import password_pool
 from routes.auth import auth_bp
 from routes.main import main_bp
 from routes.api import api_bp
 from routes.logs import logs_bp
+from routes.ingest import ingest_bp
+from routes.metrics import metrics_bp
 import os
 
 app = Flask(__name__)
 
 app.config['SECRET_KEY'] = 'your-secret-key-change-in-production'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///database.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['COLLECTOR_INTERVAL'] = float(os.environ.get('COLLECTOR_INTERVAL', 1.0))
+app.config['METRICS_DB_PATH'] = os.environ.get('METRICS_DB_PATH', os.path.join(app.root_path, 'metrics.db'))
+app.config['COLLECTOR_MODE'] = os.environ.get('COLLECTOR_MODE', 'thread')
+app.config['SNAPSHOT_PATH'] = os.environ.get('SNAPSHOT_PATH', default_snapshot_path(app.root_path))
+app.config['CPU_THRESHOLD'] = float(os.environ.get('CPU_THRESHOLD', 85))
+app.config['RAM_THRESHOLD'] = float(os.environ.get('RAM_THRESHOLD', 90))
+app.config['DISK_THRESHOLD'] = float(os.environ.get('DISK_THRESHOLD', 95))
+app.config['ALERT_FOR_SECONDS'] = float(os.environ.get('ALERT_FOR_SECONDS', 30))
+app.config['ALERT_HYSTERESIS'] = float(os.environ.get('ALERT_HYSTERESIS', 5))
+app.config['ANOMALY_METRICS'] = os.environ.get('ANOMALY_METRICS', 'cpu,ram,disk')
+app.config['ANOMALY_Z'] = float(os.environ.get('ANOMALY_Z', 4))
+app.config['ANOMALY_WINDOW'] = float(os.environ.get('ANOMALY_WINDOW', 600))
+app.config['ANOMALY_SEASONAL_DAYS'] = float(os.environ.get('ANOMALY_SEASONAL_DAYS', 7))
+app.config['ANOMALY_MIN_STD'] = float(os.environ.get('ANOMALY_MIN_STD', 2))
+app.config['ANOMALY_FOR_SECONDS'] = float(os.environ.get('ANOMALY_FOR_SECONDS', 30))
+app.config['INGEST_TOKEN'] = os.environ.get('INGEST_TOKEN')
+app.config['HOST_OFFLINE_SECONDS'] = float(os.environ.get('HOST_OFFLINE_SECONDS', 60))
+app.config['METRICS_EXPORT_DIR'] = os.environ.get('METRICS_EXPORT_DIR')
+app.config['METRICS_RETENTION'] = {
+    'raw': float(os.environ.get('METRICS_RETENTION_RAW_DAYS', 7)) * 86400,
+    '1m': float(os.environ.get('METRICS_RETENTION_1M_DAYS', 30)) * 86400,
+    '1h': float(os.environ.get('METRICS_RETENTION_1H_DAYS', 400)) * 86400,
+}
+app.config['SUMMARY_MAX_WINDOW'] = float(os.environ.get('SUMMARY_MAX_WINDOW_HOURS', 24)) * 3600
+app.config['SUMMARY_RAW_WINDOW'] = float(os.environ.get('SUMMARY_RAW_WINDOW_MINUTES', 15)) * 60
+app.config['SUMMARY_CACHE_SECONDS'] = float(os.environ.get('SUMMARY_CACHE_SECONDS', 5))
+app.config['LOGIN_WORKERS'] = int(os.environ.get('LOGIN_WORKERS', 0)) or None
+app.config['LOGIN_QUEUE_LIMIT'] = int(os.environ.get('LOGIN_QUEUE_LIMIT', 0)) or None
+app.config['LOGIN_MAX_WAIT'] = float(os.environ.get('LOGIN_MAX_WAIT', 1))
+app.config['LOGIN_TIMEOUT'] = float(os.environ.get('LOGIN_TIMEOUT', 5))
+app.config['WRITE_BEHIND_INTERVAL'] = float(os.environ.get('WRITE_BEHIND_INTERVAL', 0.05))
+app.config['WRITE_BEHIND_BATCH'] = int(os.environ.get('WRITE_BEHIND_BATCH', 1000))
+app.config['WRITE_BEHIND_MAX_PENDING'] = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 20000))
+app.config['STREAM_MAX_CLIENTS'] = int(os.environ.get('STREAM_MAX_CLIENTS', 0)) or None
 
+instrumentation.init_app(app)
 db.init_app(app)
+metrics_store.init_app(app)
+alert_engine.init_app(app)
+anomaly_watcher.init_app(app)
+metric_summaries.init_app(app)
+password_pool.init_app(app)
+db_writes.init_app(app)
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(main_bp)
 app.register_blueprint(api_bp)
 app.register_blueprint(logs_bp)
+app.register_blueprint(ingest_bp)
+app.register_blueprint(metrics_bp)
 
 @app.template_filter('format_bytes')
 def format_bytes(bytes_value):
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Simulate many monitoring agents pushing to a central dashboard's /api/ingest
+
+Each simulated agent produces one synthetic sample per --interval and pushes a
+batch every --batch-seconds, exactly like agent.py, with pushes spread across
+the batch window. Reports delivered samples, request latency and how far
+pushes fell behind schedule (which grows without bound if the server cannot
+keep up). Example, with the server running on port 5000:
+
+    python benchmarks/agent_swarm.py --agents 1000 --duration 60
+"""
+
+import argparse
+import heapq
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.wire_format import CONTENT_TYPE, encode_batch
+
+
+def synthetic_rows(start, count, interval):
+    return [
+        [start + i * interval, random.uniform(0, 100), random.uniform(20, 90), random.uniform(10, 95),
+         random.uniform(0, 1e7), random.uniform(0, 2e7)]
+        for i in range(count)
+    ]
+
+
+def swarm(base_url, token, agent_ids, interval, batch_seconds, duration, threads, wire_format, results):
+    parts = urlsplit(base_url)
+    local = threading.local()
+    headers = {'Content-Type': CONTENT_TYPE if wire_format == 'binary' else 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    samples_per_batch = max(1, round(batch_seconds / interval))
+
+    def push(agent_id, scheduled):
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        host = f'agent-{agent_id:05d}'
+        rows = synthetic_rows(time.time() - batch_seconds, samples_per_batch, interval)
+        if wire_format == 'binary':
+            body = encode_batch(host, rows)
+        else:
+            body = json.dumps({'host': host, 'samples': rows}).encode()
+        lag = time.monotonic() - scheduled
+        start = time.perf_counter()
+        try:
+            connection.request('POST', '/api/ingest', body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            local.connection = None
+            ok = False
+        return ok, time.perf_counter() - start, lag
+
+    start = time.monotonic()
+    schedule = [(start + random.uniform(0, batch_seconds), agent_id) for agent_id in agent_ids]
+    heapq.heapify(schedule)
+    futures = []
+    with ThreadPoolExecutor(threads) as pool:
+        while schedule:
+            due, agent_id = heapq.heappop(schedule)
+            if due - start > duration:
+                break
+            delay = due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(push, agent_id, due))
+            heapq.heappush(schedule, (due + batch_seconds, agent_id))
+
+    outcomes = [future.result() for future in futures]
+    results.put((
+        [latency for ok, latency, lag in outcomes if ok],
+        sum(1 for ok, latency, lag in outcomes if not ok),
+        max((lag for ok, latency, lag in outcomes), default=0.0),
+        sum(1 for ok, latency, lag in outcomes if ok) * samples_per_batch
+    ))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--token')
+    parser.add_argument('--agents', type=int, default=1000)
+    parser.add_argument('--interval', type=float, default=1.0)
+    parser.add_argument('--batch-seconds', type=float, default=10.0)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--processes', type=int, default=max(1, multiprocessing.cpu_count() // 2))
+    parser.add_argument('--threads', type=int, default=16, help='concurrent pushes per process')
+    parser.add_argument('--format', choices=('binary', 'json'), default='binary')
+    args = parser.parse_args()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=swarm, args=(
+            args.url, args.token, list(range(index, args.agents, args.processes)),
+            args.interval, args.batch_seconds, args.duration, args.threads, args.format, results
+        ))
+        for index in range(args.processes)
+    ]
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+
+    latencies = []
+    errors = 0
+    max_lag = 0.0
+    samples = 0
+    for _ in processes:
+        process_latencies, process_errors, process_lag, process_samples = results.get()
+        latencies.extend(process_latencies)
+        errors += process_errors
+        max_lag = max(max_lag, process_lag)
+        samples += process_samples
+    for process in processes:
+        process.join()
+    elapsed = time.monotonic() - started
+
+    latencies.sort()
+    print(f"Agents:            {args.agents} at {1 / args.interval:g} Hz, {args.format} batches every {args.batch_seconds:g}s")
+    print(f"Pushes:            {len(latencies)} ok, {errors} failed ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"Samples stored:    {samples} ({samples / elapsed:.0f}/s, target {args.agents / args.interval:.0f}/s)")
+    print(f"Latency p50:       {percentile(latencies, 0.50) * 1000:.1f} ms")
+    print(f"Latency p99:       {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print(f"Max schedule lag:  {max_lag * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
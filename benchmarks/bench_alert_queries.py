@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Alert and login log query latency on a large database, before and after the
+schema migrations add their indexes
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models.database import db, Alert, LoginLog, User
+from models.migrations import run_migrations
+
+ALERT_TYPES = ['cpu', 'memory', 'disk', 'network', 'service']
+INDEXES = [
+    'ix_alerts_resolved_created_at',
+    'ix_alerts_alert_type_resolved',
+    'ix_login_logs_user_id_login_time',
+    'ix_login_logs_login_time',
+]
+
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def populate(rows, open_ratio):
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / rows
+    alerts = []
+    logins = []
+    for i in range(rows):
+        created = start + step * i
+        resolved = random.random() > open_ratio
+        alerts.append({
+            'alert_type': random.choice(ALERT_TYPES),
+            'message': 'High usage',
+            'severity': 'critical',
+            'created_at': created,
+            'resolved': resolved,
+            'resolved_at': created if resolved else None
+        })
+        logins.append({
+            'user_id': random.randint(1, 50),
+            'login_time': created,
+            'ip_address': '10.0.0.1',
+            'user_agent': 'bench',
+            'success': True
+        })
+        if len(alerts) == 50000:
+            db.session.execute(Alert.__table__.insert(), alerts)
+            db.session.execute(LoginLog.__table__.insert(), logins)
+            alerts, logins = [], []
+    if alerts:
+        db.session.execute(Alert.__table__.insert(), alerts)
+        db.session.execute(LoginLog.__table__.insert(), logins)
+    db.session.commit()
+
+
+QUERIES = {
+    'open alerts, newest first': lambda: Alert.query.filter_by(resolved=False).order_by(Alert.created_at.desc()).all(),
+    'open alert by type': lambda: Alert.query.filter_by(alert_type='cpu', resolved=False).first(),
+    'latest 50 logins for a user': lambda: LoginLog.query.filter_by(user_id=7).order_by(LoginLog.login_time.desc()).limit(50).all(),
+    'logins in the last day': lambda: LoginLog.query.filter(LoginLog.login_time >= datetime.utcnow() - timedelta(days=1)).count(),
+}
+
+
+def measure(repeat):
+    results = {}
+    for name, query in QUERIES.items():
+        timings = []
+        for _ in range(repeat):
+            db.session.expire_all()
+            start = time.perf_counter()
+            query()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        results[name] = timings[len(timings) // 2] * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--open-ratio', type=float, default=0.001, help='fraction of alerts left unresolved')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='bench', password_hash='x'))
+            db.session.commit()
+
+            # Start from the pre-migration schema: no secondary indexes
+            for index in INDEXES:
+                db.session.execute(text(f'DROP INDEX IF EXISTS {index}'))
+            db.session.execute(text('PRAGMA user_version = 0'))
+            db.session.commit()
+
+            print(f'Populating {args.rows:,} alerts and login logs...')
+            populate(args.rows, args.open_ratio)
+
+            before = measure(args.repeat)
+            start = time.perf_counter()
+            run_migrations(db.engine)
+            migration_seconds = time.perf_counter() - start
+            after = measure(args.repeat)
+
+        print(f'Migrations applied in {migration_seconds:.1f}s\n')
+        print(f"{'query':32} {'before (ms)':>12} {'after (ms)':>12} {'speed-up':>9}")
+        for name in QUERIES:
+            print(f'{name:32} {before[name]:12.2f} {after[name]:12.2f} {before[name] / after[name]:8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Throughput of the online anomaly detector
+
+Feeds --rounds samples per host for --hosts hosts (cpu, ram and disk each,
+so three series per host) through AnomalyDetector.observe in batches of one
+round per host, the way the collector's anomaly stage reads what agents
+ingested, and reports series updates per second.
+
+    python benchmarks/bench_anomaly.py --hosts 2000 --rounds 60
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.anomaly import AnomalyDetector
+
+METRICS = ('cpu', 'ram', 'disk')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=60)
+    parser.add_argument('--per-batch', type=int, default=10,
+                        help='samples per host in each observe() call')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    detector = AnomalyDetector()
+    host_slots = [detector.slots([(f'host-{host}', metric) for metric in METRICS]) for host in range(args.hosts)]
+    base = rng.uniform(5, 90, (args.hosts, len(METRICS)))
+    start = time.time()
+
+    elapsed = 0.0
+    for first in range(0, args.rounds, args.per_batch):
+        count = min(args.per_batch, args.rounds - first)
+        series = [slots for step in range(count) for slots in host_slots]
+        timestamps = np.repeat(start + np.arange(first, first + count, dtype=float), args.hosts)
+        values = np.tile(base, (count, 1)) + rng.normal(0, 2, (count * args.hosts, len(METRICS)))
+        began = time.perf_counter()
+        detector.observe(series, timestamps, values)
+        elapsed += time.perf_counter() - began
+
+    updates = args.hosts * len(METRICS) * args.rounds
+    print(f"{len(detector):,} series, {updates:,} updates in {elapsed:.2f}s: "
+          f"{updates / elapsed:,.0f} updates/s, {elapsed / args.rounds * 1e3:.1f} ms per round of every series")
+
+
+if __name__ == '__main__':
+    main()
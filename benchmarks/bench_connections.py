@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare connection counting via psutil.net_connections() with ConnectionStats
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psutil
+from utils.connection_stats import ConnectionStats
+
+
+def open_connections(count):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1024)
+    port = server.getsockname()[1]
+
+    sockets = [server]
+    for _ in range(count):
+        client = socket.create_connection(('127.0.0.1', port))
+        accepted, _ = server.accept()
+        sockets.extend((client, accepted))
+    return sockets
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=2000, help='loopback connection pairs to open')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    sockets = open_connections(args.connections)
+    try:
+        stats = ConnectionStats(max_age=0)
+        psutil_ms = time_call(lambda: len(psutil.net_connections()), args.repeat) * 1000
+        stats_ms = time_call(stats.collect, args.repeat) * 1000
+
+        print(f"Open sockets (approx.):        {len(sockets)}")
+        print(f"psutil.net_connections():      {psutil_ms:8.2f} ms (median)")
+        print(f"ConnectionStats.collect():     {stats_ms:8.2f} ms (median, /proc={stats.use_proc})")
+        print(f"Speed-up:                      {psutil_ms / stats_ms:8.1f}x")
+        print(f"Totals: psutil={len(psutil.net_connections())} stats={stats.collect()['total']}")
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+/api/logs latency on a log store with millions of rows
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models.database import db, LogEntry
+from models.migrations import run_migrations
+from routes.logs import logs_bp
+
+MESSAGES = [
+    ('alerts', 'High CPU usage: {n}%'),
+    ('alerts', 'High RAM usage: {n}%'),
+    ('alerts', 'High disk usage: {n}%'),
+    ('login', 'User admin login successful from 10.0.{n}.1'),
+    ('login', 'User operator{n} login failed from 10.0.{n}.2'),
+    ('system', 'Service nginx restarted ({n})'),
+    ('system', 'Backup completed in {n}s'),
+]
+SEVERITIES = ['info', 'info', 'info', 'warning', 'warning', 'error', 'critical']
+
+
+def create_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    app.register_blueprint(logs_bp)
+    return app
+
+
+def populate(rows):
+    start = datetime.utcnow() - timedelta(days=90)
+    step = timedelta(days=90) / rows
+    batch = []
+    for i in range(rows):
+        log_type, template = random.choice(MESSAGES)
+        batch.append({
+            'timestamp': start + step * i,
+            'log_type': log_type,
+            'severity': random.choice(SEVERITIES),
+            'message': template.format(n=random.randint(0, 99)),
+            'source': 'bench'
+        })
+        if len(batch) == 100000:
+            db.session.execute(LogEntry.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(LogEntry.__table__.insert(), batch)
+    db.session.commit()
+
+
+def measure(client, url, repeat):
+    timings = []
+    response = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000, response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app(os.path.join(directory, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            # Load rows without the FTS triggers, then index them in one pass
+            db.session.execute(text('PRAGMA user_version = 1'))
+            db.session.commit()
+            print(f'Populating {args.rows:,} log entries...')
+            populate(args.rows)
+            run_migrations(db.engine)
+            db.session.execute(text("INSERT INTO log_entries_fts (log_entries_fts) VALUES ('rebuild')"))
+            db.session.commit()
+
+        client = app.test_client()
+        _, first_page = measure(client, '/api/logs?date_range=all', 1)
+        deep_cursor = first_page.headers['X-Next-Cursor']
+        for _ in range(200):
+            page = client.get(f'/api/logs?date_range=all&cursor={deep_cursor}')
+            deep_cursor = page.headers['X-Next-Cursor']
+
+        cases = [
+            ('first page, all logs', '/api/logs?date_range=all'),
+            ('last 24h', '/api/logs?date_range=1'),
+            ('last 30 days', '/api/logs?date_range=30'),
+            ('last 90 days', '/api/logs?date_range=90'),
+            ('page 200 of last 30 days', f'/api/logs?date_range=30&cursor={deep_cursor}'),
+            ('type=login, 30 days', '/api/logs?type=login&date_range=30'),
+            ('severity=critical', '/api/logs?severity=critical&date_range=all'),
+            ('type+severity', '/api/logs?type=alerts&severity=error&date_range=all'),
+            ('page 200 via cursor', f'/api/logs?date_range=all&cursor={deep_cursor}'),
+            ('search "backup"', '/api/logs?search=backup&date_range=all'),
+            ('search "operator42 failed"', '/api/logs?search=operator42%20failed&date_range=all'),
+        ]
+        print(f"{'case':32} {'median (ms)':>12} {'rows':>6}")
+        for name, url in cases:
+            elapsed, response = measure(client, url, args.repeat)
+            print(f'{name:32} {elapsed:12.2f} {len(response.get_json()):6}')
+
+
+if __name__ == '__main__':
+    main()
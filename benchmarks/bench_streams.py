@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Open metrics streams against a running server and time ordinary requests
+
+Opens --streams concurrent /api/stream connections, reports how many the
+server accepted and how many it refused with 503, then times --requests
+sequential GETs of --path while the streams stay open. With gthread workers
+every accepted stream holds one worker thread, so this shows whether the
+STREAM_MAX_CLIENTS cap leaves threads for the rest of the API:
+
+    WORKERS=1 THREADS=4 python run_production.py &
+    python benchmarks/bench_streams.py --streams 8
+"""
+
+import argparse
+import http.client
+import time
+from urllib.parse import urlsplit
+
+
+def open_stream(parts):
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    connection.request('GET', '/api/stream')
+    response = connection.getresponse()
+    if response.status != 200:
+        retry_after = response.getheader('Retry-After')
+        response.read()
+        connection.close()
+        return None, response.status, retry_after
+    # Wait for the first event so the stream is really holding a thread
+    response.fp.readline()
+    return connection, response.status, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--streams', type=int, default=8)
+    parser.add_argument('--path', default='/api/all-metrics')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+    parts = urlsplit(args.url)
+
+    streams, statuses, retry_after = [], {}, None
+    for _ in range(args.streams):
+        try:
+            connection, status, retry = open_stream(parts)
+        except (OSError, http.client.HTTPException):
+            connection, status, retry = None, 'timeout', None
+        statuses[status] = statuses.get(status, 0) + 1
+        retry_after = retry_after or retry
+        if connection is not None:
+            streams.append(connection)
+    print(f"streams: {statuses}" + (f", Retry-After: {retry_after}s" if retry_after else ''))
+
+    latencies, failures = [], 0
+    for _ in range(args.requests):
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+        start = time.perf_counter()
+        try:
+            connection.request('GET', args.path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                failures += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            failures += 1
+        connection.close()
+
+    for connection in streams:
+        connection.close()
+    latencies.sort()
+    if latencies:
+        print(f"{args.path}: {len(latencies)} ok, {failures} failed, "
+              f"p50 {latencies[len(latencies) // 2] * 1e3:.1f} ms, max {latencies[-1] * 1e3:.1f} ms")
+    else:
+        print(f"{args.path}: all {failures} requests failed")
+
+
+if __name__ == '__main__':
+    main()
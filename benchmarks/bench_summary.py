@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Cost of /api/metrics/summary's buffers on a fleet with a day of history
+
+Stores --hours of 1 Hz samples for --hosts hosts (raw samples and the
+rollups the store maintains alongside them), then reports how long the
+first background load of MetricSummaries takes, how much memory its
+buffers hold, and how long a summary of the default 5m/1h/24h windows takes
+once loaded. The raw-sample windows are checked against numpy.quantile.
+
+    python benchmarks/bench_summary.py --hosts 20 --hours 24
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.metrics_store import MetricsStore
+from utils.summary import MetricSummaries
+
+WINDOWS = {'5m': 300, '1h': 3600, '24h': 86400}
+
+
+def populate(store, hosts, seconds, now):
+    rng = np.random.default_rng(0)
+    timestamps = now - seconds + np.arange(seconds, dtype=float)
+    truth = {}
+    for host in range(hosts):
+        values = rng.uniform(0, 100, (seconds, 5))
+        store.ingest(f'host-{host}', [(t, *row) for t, row in zip(timestamps.tolist(), values.tolist())], now=now)
+        truth[f'host-{host}'] = (timestamps, values.astype(np.float32))
+    return truth
+
+
+def buffer_bytes(summaries):
+    buffers = list(summaries._samples.values()) + list(summaries._rollups.values())
+    return sum(buffer.timestamps.nbytes + buffer.values.nbytes for buffer in buffers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', type=int, default=20)
+    parser.add_argument('--hours', type=float, default=24)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = MetricsStore(os.path.join(directory, 'metrics.db'))
+        # Keep the pruner out of the measurement
+        store._pruner = (os.getpid(), None)
+        now = time.time()
+        print(f'Storing {args.hosts} hosts x {args.hours:g}h of 1 Hz samples...')
+        truth = populate(store, args.hosts, int(args.hours * 3600), now)
+
+        summaries = MetricSummaries(store)
+        start = time.perf_counter()
+        summaries.refresh(now)
+        print(f'first load: {time.perf_counter() - start:.2f}s, buffers {buffer_bytes(summaries) / 2**20:.1f} MiB')
+
+        timings = []
+        for repeat in range(5):
+            summaries._cache = {}
+            start = time.perf_counter()
+            summary = summaries.summarize(WINDOWS, now=now)
+            timings.append(time.perf_counter() - start)
+        print(f'summarize {", ".join(WINDOWS)}: {min(timings) * 1e3:.1f} ms')
+
+        start = time.perf_counter()
+        summaries.refresh(now + 5)
+        print(f'incremental refresh: {(time.perf_counter() - start) * 1e3:.1f} ms')
+
+        host = summary['hosts'].index('host-0')
+        timestamps, values = truth['host-0']
+        recent = values[timestamps >= now - WINDOWS['5m'], 0]
+        expected = np.quantile(recent, (0.5, 0.95, 0.99))
+        print(f"5m p50/p95/p99 of host-0 cpu matches numpy: {np.allclose(summary['windows']['5m'][0][host, 0], expected)}")
+
+
+if __name__ == '__main__':
+    main()
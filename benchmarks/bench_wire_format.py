@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Compare agent batch encodings: size per sample and encode/decode throughput
+
+Decoding is measured up to the row tuples /api/ingest hands to the store.
+"json-dicts" is one object per sample with named keys, "json-rows" the
+positional arrays agent.py sends with --format json.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.metrics_store import SERIES_COLUMNS
+from utils.wire_format import decode_batch, encode_batch
+
+HOST = 'web-frontend-042.example.internal'
+
+
+def make_rows(count, interval):
+    start = time.time()
+    return [(
+        start + i * interval + random.uniform(0, 0.002),
+        round(random.uniform(0, 100), 1),
+        round(random.uniform(20, 90), 1),
+        random.uniform(10, 95),
+        random.uniform(0, 1e7),
+        random.uniform(0, 2e7)
+    ) for i in range(count)]
+
+
+def json_dicts_encode(rows):
+    samples = [dict(zip(('timestamp',) + SERIES_COLUMNS, row)) for row in rows]
+    return json.dumps({'host': HOST, 'samples': samples}, separators=(',', ':')).encode()
+
+
+def json_dicts_decode(data):
+    keys = ('timestamp',) + SERIES_COLUMNS
+    return [tuple(float(sample[key]) for key in keys) for sample in json.loads(data)['samples']]
+
+
+def json_rows_encode(rows):
+    return json.dumps({'host': HOST, 'samples': rows}, separators=(',', ':')).encode()
+
+
+def json_rows_decode(data):
+    return [tuple(float(value) for value in sample) for sample in json.loads(data)['samples']]
+
+
+ENCODINGS = {
+    'json-dicts': (json_dicts_encode, json_dicts_decode),
+    'json-rows': (json_rows_encode, json_rows_decode),
+    'binary': (lambda rows: encode_batch(HOST, rows),
+               lambda data: decode_batch(data).rows(SERIES_COLUMNS)),
+    'binary+zlib': (lambda rows: encode_batch(HOST, rows, compress=True),
+                    lambda data: decode_batch(data).rows(SERIES_COLUMNS)),
+}
+
+
+def best_of(func, argument, repeat, number):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(argument)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[10, 60, 600])
+    parser.add_argument('--interval', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'batch':>6} {'encoding':<12} {'bytes/sample':>13} {'encode/s':>12} {'decode/s':>12}  (samples per second)")
+    for size in args.batch_sizes:
+        rows = make_rows(size, args.interval)
+        number = max(1, 20000 // size)
+        for name, (encode, decode) in ENCODINGS.items():
+            data = encode(rows)
+            decoded = decode(data)
+            assert len(decoded) == size
+            encode_time = best_of(encode, rows, args.repeat, number)
+            decode_time = best_of(decode, data, args.repeat, number)
+            print(f"{size:>6} {name:<12} {len(data) / size:>13.1f} "
+                  f"{size / encode_time:>12,.0f} {size / decode_time:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
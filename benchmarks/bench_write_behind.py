@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Compare per-event commits with the shared write-behind queue
+
+Writes --events login log rows (each mirrored into log_entries) from
+--threads threads, once committing every row on its own through the ORM like
+the request handlers used to, and once through record_login(), which groups
+whatever arrives within a flush window into a single transaction. Runs
+against a throw-away SQLite database.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def per_event(app, count):
+    from models.database import db, LoginLog
+    with app.app_context():
+        for index in range(count):
+            db.session.add(LoginLog(user_id=1, login_time=datetime.utcnow(), ip_address=f'10.0.{index % 256}.1',
+                                    user_agent='bench_write_behind', success=index % 3 != 0))
+            db.session.commit()
+
+
+def write_behind(app, count):
+    from models.database import record_login
+    futures = [record_login(1, f'10.0.{index % 256}.1', 'bench_write_behind', index % 3 != 0)
+               for index in range(count)]
+    for future in futures:
+        future.result()
+
+
+def run(app, mode, events, threads):
+    per_thread = events // threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for future in [pool.submit(mode, app, per_thread) for _ in range(threads)]:
+            future.result()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='nm-write-behind-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'database.db')}"
+    os.environ['METRICS_DB_PATH'] = os.path.join(workdir, 'metrics.db')
+    try:
+        from app import app
+        from models.database import init_database
+        init_database(app)
+
+        for name, mode in (('per-event commit', per_event), ('write-behind', write_behind)):
+            rate = run(app, mode, args.events, args.threads)
+            print(f"{name:<18} {rate:>10,.0f} events/s")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
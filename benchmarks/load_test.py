@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+HTTP load test for a running dashboard server
+
+Spawns client processes that hit the given paths over keep-alive connections
+and reports throughput and latency percentiles. Run it against
+run_production.py with different WORKERS values to check scaling, e.g.:
+
+    WORKERS=1 python run_production.py &
+    python benchmarks/load_test.py --clients 16 --duration 10
+"""
+
+import argparse
+import http.client
+import multiprocessing
+import time
+from urllib.parse import urlsplit
+
+
+def client(base_url, paths, duration, results):
+    parts = urlsplit(base_url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+    index = 0
+
+    while time.monotonic() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+    connection.close()
+    results.put((latencies, errors))
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--paths', nargs='+', default=['/api/all-metrics', '/api/cpu', '/api/alerts'])
+    parser.add_argument('--clients', type=int, default=multiprocessing.cpu_count() * 4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    args = parser.parse_args()
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client, args=(args.url, args.paths, args.duration, results))
+        for _ in range(args.clients)
+    ]
+    for process in processes:
+        process.start()
+
+    latencies = []
+    errors = 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in processes:
+        process.join()
+
+    latencies.sort()
+    print(f'Clients:     {args.clients}')
+    print(f'Requests:    {len(latencies):,} ({errors} errors)')
+    print(f'Throughput:  {len(latencies) / args.duration:,.0f} req/s')
+    print(f'Latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms')
+    print(f'Latency p99: {percentile(latencies, 0.99) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Fire many concurrent login attempts at a running dashboard
+
+Every simulated client posts to /auth/login at the same moment (the start is
+synchronized with a barrier) and latency is reported separately for logins
+that were answered (302 on success, 200 on a wrong password) and for those
+turned away with 503 because the password pool was saturated. Example, with
+the server running on port 5000:
+
+    python benchmarks/login_load.py --concurrency 200
+    python benchmarks/login_load.py --concurrency 200 --rounds 5 --wrong-password
+"""
+
+import argparse
+import http.client
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+
+def attempt(parts, body, barrier):
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    barrier.wait()
+    start = time.perf_counter()
+    try:
+        connection.request('POST', '/auth/login', body=body,
+                           headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        status = None
+    finally:
+        connection.close()
+    return status, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def report(label, latencies):
+    latencies.sort()
+    if not latencies:
+        print(f"{label:<12} 0")
+        return
+    print(f"{label:<12} {len(latencies):>5}   p50 {percentile(latencies, 0.50) * 1000:>8.1f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:>8.1f} ms   max {latencies[-1] * 1000:>8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=200, help='simultaneous login attempts per round')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--wrong-password', action='store_true', help='send a bad password (failed-login path)')
+    args = parser.parse_args()
+
+    parts = urlsplit(args.url)
+    password = args.password + '-wrong' if args.wrong_password else args.password
+    body = urlencode({'username': args.username, 'password': password})
+
+    answered, rejected, errors = [], [], 0
+    started = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for _ in range(args.rounds):
+            barrier = threading.Barrier(args.concurrency)
+            futures = [pool.submit(attempt, parts, body, barrier) for _ in range(args.concurrency)]
+            for future in futures:
+                status, latency = future.result()
+                if status in (200, 302):
+                    answered.append(latency)
+                elif status == 503:
+                    rejected.append(latency)
+                else:
+                    errors += 1
+    elapsed = time.monotonic() - started
+
+    print(f"{args.rounds} rounds of {args.concurrency} concurrent logins in {elapsed:.1f}s, {errors} errors")
+    report('answered', answered)
+    report('rejected', rejected)
+    report('all', answered + rejected)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for SystemMonitor and the API blueprints
+
+Times every SystemMonitor.get_* method with real psutil data and in simulated
+mode, then every route in routes/api.py, routes/logs.py and routes/ingest.py
+through the Flask test client against throw-away databases seeded with
+sample data. Results are written as JSON; --compare flags cases whose median
+got slower than a saved baseline by more than --threshold.
+
+    python benchmarks/run.py --output baseline.json
+    # ... change something ...
+    python benchmarks/run.py --output current.json --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BLUEPRINTS = ('api', 'logs', 'ingest')
+LOG_MESSAGES = [
+    ('alerts', 'warning', 'High CPU usage: {n}%'),
+    ('alerts', 'critical', 'High disk usage: {n}%'),
+    ('login', 'info', 'User admin login successful from 10.0.{n}.1'),
+    ('login', 'warning', 'User operator{n} login failed from 10.0.{n}.2'),
+    ('system', 'info', 'Backup completed in {n}s'),
+]
+
+
+def summarize(timings):
+    timings = sorted(timings)
+    count = len(timings)
+    total = sum(timings)
+    return {
+        'count': count,
+        'mean_ms': total / count * 1000,
+        'p50_ms': timings[count // 2] * 1000,
+        'p95_ms': timings[min(count - 1, int(count * 0.95))] * 1000,
+        'max_ms': timings[-1] * 1000,
+        'ops_per_sec': count / total if total else 0.0,
+    }
+
+
+def time_calls(func, repeat, warmup=3):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+def bench_monitor(repeat, name_filter):
+    from utils.system_monitor import SystemMonitor
+
+    results = {}
+    methods = sorted(name for name in dir(SystemMonitor) if name.startswith('get_'))
+    for mode in ('real', 'simulated'):
+        monitor = SystemMonitor()
+        if mode == 'simulated':
+            monitor.use_real_data = False
+        for name in methods:
+            key = f'monitor.{mode}.{name}'
+            if name_filter and name_filter not in key:
+                continue
+            method = getattr(monitor, name)
+            # Blocking CPU sampling would only measure the sleep
+            call = (lambda: method(interval=None)) if name == 'get_cpu_usage' else method
+            results[key] = time_calls(call, repeat)
+    return results
+
+
+def seed(app, log_rows, hosts):
+    from models.database import db, init_database, Alert, LogEntry
+    from models.metrics_store import metrics_store
+
+    init_database(app)
+    now = datetime.utcnow()
+    with app.app_context():
+        step = timedelta(days=30) / max(log_rows, 1)
+        rows = []
+        for i in range(log_rows):
+            log_type, severity, template = random.choice(LOG_MESSAGES)
+            rows.append({
+                'timestamp': now - timedelta(days=30) + step * i,
+                'log_type': log_type,
+                'severity': severity,
+                'message': template.format(n=random.randint(0, 99)),
+                'source': 'benchmark'
+            })
+        if rows:
+            db.session.execute(LogEntry.__table__.insert(), rows)
+        alert = Alert(alert_type='cpu', message='High CPU usage: 97.0%', severity='critical')
+        db.session.add(alert)
+        db.session.commit()
+        alert_id = alert.id
+
+    start = time.time() - 3600
+    # A month of one-minute samples before the last hour, for the range queries
+    metrics_store.append_rows([(start - 30 * 86400 + i * 60, random.uniform(0, 100), random.uniform(20, 90), 50.0,
+                                random.uniform(0, 1e6), random.uniform(0, 1e6)) for i in range(30 * 1440)])
+    series = [(start + i, random.uniform(0, 100), random.uniform(20, 90), 50.0,
+               random.uniform(0, 1e6), random.uniform(0, 1e6)) for i in range(3600)]
+    metrics_store.append_rows(series)
+    for index in range(hosts):
+        metrics_store.ingest(f'bench-{index:03d}', series[-600:], address='127.0.0.1')
+    return alert_id
+
+
+def endpoint_cases(app, alert_id):
+    """(name, method, path, request kwargs) for every benchmarked route."""
+    from utils.wire_format import CONTENT_TYPE, encode_batch
+
+    batch = [(time.time() - 10 + i, 10.0, 20.0, 30.0, 1e5, 2e5) for i in range(10)]
+    special = {
+        'api.resolve_alert': [('POST', f'/api/resolve-alert/{alert_id}', {})],
+        'api.get_historical_data': [
+            ('GET', '/api/historical-data', {}),
+            ('GET', '/api/historical-data?minutes=60', {}),
+            ('GET', '/api/historical-data?minutes=60&width=600', {}),
+            ('GET', '/api/historical-data?host=bench-000&points=600', {}),
+        ],
+        'api.get_metrics_range': [
+            ('GET', '/api/metrics/range?metric=cpu', {}),
+            ('GET', '/api/metrics/range?metric=cpu&start={month_ago}&step=1h', {}),
+            ('GET', '/api/metrics/range?metric=ram&start={month_ago}&step=1d', {}),
+        ],
+        'api.get_all_metrics': [
+            ('GET', '/api/all-metrics', {}),
+            ('GET', '/api/all-metrics', {'headers': {'Accept-Encoding': 'gzip'}}),
+            ('GET', '/api/all-metrics?since={version}', {}),
+            ('GET', '/api/all-metrics', {'headers': {'If-None-Match': '"{version}"'}}),
+        ],
+        'logs.get_logs': [
+            ('GET', '/api/logs', {}),
+            ('GET', '/api/logs?search=failed', {}),
+            ('GET', '/api/logs?type=alerts&severity=critical&date_range=7', {}),
+            ('GET', '/api/logs?date_range=all&limit=500', {}),
+        ],
+        'logs.get_logs_stats': [
+            ('GET', '/api/logs/stats', {}),
+            ('GET', '/api/logs/stats?date_range=7&type=login', {}),
+        ],
+        'ingest.ingest': [
+            ('POST', '/api/ingest', {'data': encode_batch('bench-ingest', batch),
+                                     'content_type': CONTENT_TYPE}),
+            ('POST', '/api/ingest', {'json': {'host': 'bench-ingest', 'samples': [list(row) for row in batch]}}),
+        ],
+    }
+
+    cases = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        if rule.endpoint.split('.')[0] not in BLUEPRINTS:
+            continue
+        if rule.endpoint in special:
+            variants = special[rule.endpoint]
+        elif rule.arguments:
+            print(f"  skipping {rule.rule}: no sample arguments defined")
+            continue
+        else:
+            variants = [('GET', rule.rule, {})]
+        for method, path, kwargs in variants:
+            suffix = ' gzip' if 'Accept-Encoding' in kwargs.get('headers', {}) else ''
+            suffix += ' conditional' if 'If-None-Match' in kwargs.get('headers', {}) else ''
+            suffix += ' json' if 'json' in kwargs else ''
+            cases.append((f'endpoint.{method} {path}{suffix}', method, path, kwargs))
+    return cases
+
+
+def first_stream_event(client):
+    response = client.get('/api/stream', buffered=False)
+    try:
+        for chunk in response.response:
+            if b'event: metrics' in (chunk if isinstance(chunk, bytes) else chunk.encode()):
+                break
+    finally:
+        response.close()
+
+
+def bench_endpoints(repeat, name_filter, log_rows, hosts):
+    workdir = tempfile.mkdtemp(prefix='nm-bench-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'database.db')}"
+    os.environ['METRICS_DB_PATH'] = os.path.join(workdir, 'metrics.db')
+    os.environ['COLLECTOR_MODE'] = 'thread'
+    os.environ.pop('INGEST_TOKEN', None)
+
+    from app import app
+    from routes import api
+
+    app.config['TESTING'] = True
+    alert_id = seed(app, log_rows, hosts)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = 'admin'
+
+    results = {}
+    try:
+        client.get('/api/cpu')
+        for name, method, path, kwargs in endpoint_cases(app, alert_id):
+            if name_filter and name_filter not in name:
+                continue
+            if path == '/api/stream':
+                results[f'endpoint.GET {path} first event'] = time_calls(lambda: first_stream_event(client), repeat)
+                continue
+
+            def call(method=method, path=path, kwargs=kwargs):
+                version = api.collector.event_id(api.collector.latest())
+                options = dict(kwargs)
+                if 'headers' in options:
+                    options['headers'] = {key: value.replace('{version}', version)
+                                          for key, value in options['headers'].items()}
+                url = path.replace('{version}', version).replace('{month_ago}', str(int(time.time() - 30 * 86400)))
+                response = client.open(url, method=method, **options)
+                if response.status_code >= 400:
+                    raise RuntimeError(f'{method} {path} returned {response.status_code}')
+                return response
+
+            results[name] = time_calls(call, repeat)
+    finally:
+        api.collector.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    regressions = []
+    print(f"\n{'case':<70} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(set(results) & set(baseline)):
+        before = baseline[name]['p50_ms']
+        after = results[name]['p50_ms']
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > threshold and after - before > min_delta_ms:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold and before - after > min_delta_ms:
+            flag = '  faster'
+        print(f"{name[:70]:<70} {before:>9.3f}ms {after:>9.3f}ms {change:>+7.0%}{flag}")
+    skipped = len(set(baseline) - set(results))
+    if skipped:
+        print(f"({skipped} baseline cases were not run)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='benchmark-results.json', help='where to write the JSON results')
+    parser.add_argument('--compare', metavar='BASELINE', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='relative slowdown of the median flagged as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='ignore changes smaller than this')
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per case')
+    parser.add_argument('--only', choices=('monitor', 'endpoints'))
+    parser.add_argument('--filter', help='only run cases whose name contains this')
+    parser.add_argument('--log-rows', type=int, default=20000, help='log entries seeded for the endpoint cases')
+    parser.add_argument('--hosts', type=int, default=20, help='agent hosts seeded for the endpoint cases')
+    args = parser.parse_args()
+
+    results = {}
+    if args.only in (None, 'monitor'):
+        print('Timing SystemMonitor...')
+        results.update(bench_monitor(args.repeat, args.filter))
+    if args.only in (None, 'endpoints'):
+        print('Timing endpoints...')
+        results.update(bench_endpoints(args.repeat, args.filter, args.log_rows, args.hosts))
+
+    print(f"\n{'case':<70} {'p50':>10} {'p95':>10} {'ops/s':>10}")
+    for name, stats in results.items():
+        print(f"{name[:70]:<70} {stats['p50_ms']:>8.3f}ms {stats['p95_ms']:>8.3f}ms {stats['ops_per_sec']:>10.0f}")
+
+    with open(args.output, 'w') as output:
+        json.dump({'environment': environment(), 'results': results}, output, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+        print('\n✅ No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Standalone metrics collector for multi-process deployments
+
+Samples SystemMonitor every COLLECTOR_INTERVAL seconds, records history and
+alerts, and publishes each snapshot into the shared-memory segment at
+SNAPSHOT_PATH. API workers started with COLLECTOR_MODE=external map that
+segment and read snapshots from it instead of sampling themselves.
+"""
+
+import os
+import signal
+import threading
+
+
+def main():
+    # This process is the one that samples, whatever the parent asked workers to do
+    os.environ['COLLECTOR_MODE'] = 'thread'
+
+    from app import app
+    from models.database import init_database
+    from routes.api import collector
+    from utils.snapshot_channel import SnapshotPublisher
+
+    init_database(app)
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+
+    collector.publisher = SnapshotPublisher(app.config['SNAPSHOT_PATH'])
+    collector.start(app.config['COLLECTOR_INTERVAL'])
+    print(f"📈 Metrics collector sampling every {collector.interval}s -> {app.config['SNAPSHOT_PATH']}")
+
+    try:
+        stop_event.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        collector.stop()
+
+
+if __name__ == '__main__':
+    main()
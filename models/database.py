@@ -1,9 +1,49 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, select
+from sqlalchemy.engine import Engine
 from datetime import datetime
+import sqlite3
+import time
 import bcrypt
+from utils.instrumentation import instrumentation
+from utils.write_behind import WriteBehindQueue
 
 db = SQLAlchemy()
 
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('cache_size', -20000),
+    ('temp_store', 'MEMORY'),
+)
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets dashboard readers run concurrently with the alert writer
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'UNKNOWN'
+    instrumentation.observe('db_query_duration_seconds', elapsed, ('main', operation))
+
+@event.listens_for(Engine, 'handle_error')
+def discard_query_timer(context):
+    timers = context.connection.info.get('query_start') if context.connection is not None else None
+    if timers:
+        timers.pop()
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -31,28 +71,222 @@ class LoginLog(db.Model):
     success = db.Column(db.Boolean, default=True)
     
     user = db.relationship('User', backref=db.backref('login_logs', lazy=True))
+    
+    __table_args__ = (
+        db.Index('ix_login_logs_user_id_login_time', 'user_id', 'login_time'),
+        db.Index('ix_login_logs_login_time', 'login_time'),
+    )
 
 class Alert(db.Model):
     __tablename__ = 'alerts'
     
     id = db.Column(db.Integer, primary_key=True)
-    alert_type = db.Column(db.String(50), nullable=False)
+    alert_type = db.Column(db.String(300), nullable=False)
     message = db.Column(db.Text, nullable=False)
     severity = db.Column(db.String(20), default='warning')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     resolved = db.Column(db.Boolean, default=False)
     resolved_at = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('ix_alerts_resolved_created_at', 'resolved', 'created_at'),
+        db.Index('ix_alerts_alert_type_resolved', 'alert_type', 'resolved'),
+    )
+    
     def resolve(self):
         self.resolved = True
         self.resolved_at = datetime.utcnow()
 
+class SystemEvent(db.Model):
+    __tablename__ = 'system_events'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    severity = db.Column(db.String(20), default='info')
+    message = db.Column(db.Text, nullable=False)
+    source = db.Column(db.String(50), default='system')
+
+class LogEntry(db.Model):
+    """Unified, append-only view of login logs, alerts and system events.
+
+    Rows are written alongside the source row (see the after_insert listeners
+    below) so /api/logs can filter, page and full-text search a single
+    indexed table. Ids follow commit order, which write-behind can make
+    differ from time order, so pages are keyed on ``(timestamp, id)``; the
+    type and severity indexes end in those columns so filtered pages seek
+    the same way. The log_entries_fts FTS5 index is kept in sync by
+    triggers created in models.migrations.
+    """
+    __tablename__ = 'log_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    log_type = db.Column(db.String(20), nullable=False)
+    severity = db.Column(db.String(20), nullable=False, default='info')
+    message = db.Column(db.Text, nullable=False)
+    source = db.Column(db.String(50))
+    source_id = db.Column(db.Integer)
+    
+    __table_args__ = (
+        db.Index('ix_log_entries_timestamp', 'timestamp'),
+        db.Index('ix_log_entries_log_type_timestamp', 'log_type', 'timestamp', 'id'),
+        db.Index('ix_log_entries_severity_timestamp', 'severity', 'timestamp', 'id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'type': self.log_type,
+            'severity': self.severity,
+            'message': self.message,
+            'source': self.source
+        }
+
+class LogStatsHourly(db.Model):
+    """Per-hour log counts by type and severity.
+
+    Maintained incrementally by triggers on log_entries (see
+    models.migrations), so stats for any range are a sum over a few buckets.
+    """
+    __tablename__ = 'log_stats_hourly'
+    
+    bucket = db.Column(db.DateTime, primary_key=True)
+    log_type = db.Column(db.String(20), primary_key=True)
+    severity = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+def _append_log_entry(connection, **values):
+    connection.execute(LogEntry.__table__.insert(), values)
+
+def _login_log_entry(username, success, ip_address, login_time, login_log_id):
+    outcome = 'login successful' if success else 'login failed'
+    return {
+        'timestamp': login_time or datetime.utcnow(),
+        'log_type': 'login',
+        'severity': 'info' if success else 'warning',
+        'message': f'User {username or "unknown"} {outcome} from {ip_address or "unknown address"}',
+        'source': 'auth_system',
+        'source_id': login_log_id
+    }
+
+@event.listens_for(LoginLog, 'after_insert')
+def log_login(mapper, connection, target):
+    username = connection.execute(
+        select(User.username).where(User.id == target.user_id)
+    ).scalar()
+    _append_log_entry(connection, **_login_log_entry(
+        username, target.success, target.ip_address, target.login_time, target.id
+    ))
+
+@event.listens_for(Alert, 'after_insert')
+def log_alert(mapper, connection, target):
+    _append_log_entry(
+        connection,
+        timestamp=target.created_at or datetime.utcnow(),
+        log_type='alerts',
+        severity=target.severity or 'warning',
+        message=target.message,
+        source='system_monitor',
+        source_id=target.id
+    )
+
+@event.listens_for(SystemEvent, 'after_insert')
+def log_system_event(mapper, connection, target):
+    _append_log_entry(
+        connection,
+        timestamp=target.created_at or datetime.utcnow(),
+        log_type='system',
+        severity=target.severity or 'info',
+        message=target.message,
+        source=target.source or 'system',
+        source_id=target.id
+    )
+
+def record_system_event(message, severity='info', source='system'):
+    event_row = SystemEvent(message=message, severity=severity, source=source)
+    db.session.add(event_row)
+    return event_row
+
+def batched(operation):
+    """Mark a write operation as taking a list of argument tuples.
+
+    Everything queued for it within one flush window is handed over in a
+    single call, after the unbatched operations of that window, and it
+    returns one result per entry.
+    """
+    operation.batched = True
+    return operation
+
+def apply_writes(operations):
+    results = [None] * len(operations)
+    groups = {}
+    try:
+        for index, (operation, args) in enumerate(operations):
+            if getattr(operation, 'batched', False):
+                groups.setdefault(operation, []).append((index, args))
+            else:
+                results[index] = operation(*args)
+        for operation, calls in groups.items():
+            for (index, args), result in zip(calls, operation([args for index, args in calls])):
+                results[index] = result
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return results
+
+# One queue per process shared by every blueprint: writes submitted within a
+# flush window are committed together in a single transaction.
+db_writes = WriteBehindQueue('database', apply_writes)
+
+def persist(operation, *args):
+    """Run ``operation(*args)`` in the next shared write transaction.
+
+    Returns a Future for the operation's return value; call ``result()`` on
+    it to wait until the write is committed.
+    """
+    return db_writes.submit((operation, args))
+
+@batched
+def insert_login_logs(calls):
+    # Core executemany instead of one ORM flush and listener call per row
+    rows = [values for values, in calls]
+    ids = db.session.execute(
+        LoginLog.__table__.insert().returning(LoginLog.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    usernames = dict(db.session.execute(
+        select(User.id, User.username).where(User.id.in_({row['user_id'] for row in rows}))
+    ).all())
+    db.session.execute(LogEntry.__table__.insert(), [
+        _login_log_entry(usernames.get(row['user_id']), row['success'], row['ip_address'], row['login_time'], login_log_id)
+        for row, login_log_id in zip(rows, ids)
+    ])
+    return ids
+
+def record_login(user_id, ip_address, user_agent, success):
+    return persist(insert_login_logs, {
+        'user_id': user_id,
+        'login_time': datetime.utcnow(),
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'success': success
+    })
+
 def init_database(app):
+    from models.migrations import run_migrations
+    
     with app.app_context():
         db.create_all()
+        applied = run_migrations(db.engine)
+        
+        for version, description in applied:
+            record_system_event(f'Database migrated to schema version {version}: {description}')
         
         if not User.query.filter_by(username='admin').first():
             admin_user = User(username='admin')
             admin_user.set_password('admin123')
             db.session.add(admin_user)
-            db.session.commit()
+        
+        record_system_event('Application started')
+        db.session.commit()
@@ -0,0 +1,444 @@
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from utils.instrumentation import instrumentation
+
+logger = logging.getLogger(__name__)
+
+SERIES_COLUMNS = ('cpu', 'ram', 'disk', 'upload', 'download')
+
+# Samples taken by this instance's own collector; remote agents use their name
+LOCAL_HOST = ''
+
+# Storage tiers, finest first. ``resolution`` is the bucket width in seconds
+# (0 for raw samples); ``retention`` is the default age in seconds after which
+# rows are deleted.
+Tier = namedtuple('Tier', 'name table resolution retention')
+
+TIERS = (
+    Tier('raw', 'samples', 0, 7 * 86400),
+    Tier('1m', 'rollups_1m', 60, 30 * 86400),
+    Tier('1h', 'rollups_1h', 3600, 400 * 86400),
+)
+ROLLUP_TIERS = TIERS[1:]
+
+RangeResult = namedtuple('RangeResult', 'tier start step points')
+
+PRUNE_INTERVAL = 300
+# Rows deleted per pruning transaction; writers get the lock between batches
+PRUNE_BATCH = 5000
+
+
+class MetricsStore:
+    """Append-only time-series store for collector samples.
+
+    Lives in its own SQLite file (WAL mode) next to the application so history
+    survives restarts without contending with the SQLAlchemy database. Each
+    thread gets its own connection; writes are serialized by a lock.
+
+    Samples are keyed by host: the local collector writes under LOCAL_HOST and
+    remote agents under their own name. The ``hosts`` table keeps the latest
+    sample of every agent so the host list never scans ``samples``.
+
+    Every write also folds its samples into 1-minute and 1-hour rollups
+    (min/max/avg/count per host and metric), so range queries over days read
+    a few hundred rollup rows instead of every sample. A background thread
+    prunes each tier to its own retention every PRUNE_INTERVAL seconds, in
+    batches of PRUNE_BATCH rows so appends never wait behind a large delete.
+    """
+
+    def __init__(self, path=None, retention=None):
+        self.path = path
+        self.retention = {tier.name: tier.retention for tier in TIERS}
+        self.retention.update(retention or {})
+        self._pruner = None
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        if path:
+            self._create_schema()
+
+    def init_app(self, app):
+        self.path = app.config.get('METRICS_DB_PATH') or os.path.join(app.root_path, 'metrics.db')
+        self.retention.update(app.config.get('METRICS_RETENTION') or {})
+        self._create_schema()
+
+    @property
+    def ready(self):
+        return self.path is not None
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _create_schema(self):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'id INTEGER PRIMARY KEY, '
+                'timestamp REAL NOT NULL, '
+                'cpu REAL, ram REAL, disk REAL, upload REAL, download REAL, '
+                "host TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(samples)')}
+            if 'host' not in columns:
+                connection.execute("ALTER TABLE samples ADD COLUMN host TEXT NOT NULL DEFAULT ''")
+            connection.execute('DROP INDEX IF EXISTS idx_samples_timestamp')
+            connection.execute('CREATE INDEX IF NOT EXISTS idx_samples_host_timestamp ON samples (host, timestamp)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS hosts ('
+                'host TEXT PRIMARY KEY, '
+                'address TEXT, '
+                'first_seen REAL NOT NULL, '
+                'last_seen REAL NOT NULL, '
+                'timestamp REAL, '
+                'cpu REAL, ram REAL, disk REAL, upload REAL, download REAL, '
+                'system_info TEXT)'
+            )
+            for tier in ROLLUP_TIERS:
+                exists = connection.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (tier.table,)
+                ).fetchone()
+                connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS {tier.table} ('
+                    'host TEXT NOT NULL, '
+                    'metric TEXT NOT NULL, '
+                    'bucket REAL NOT NULL, '
+                    'min REAL, max REAL, avg REAL, count INTEGER NOT NULL, '
+                    'PRIMARY KEY (host, metric, bucket)) WITHOUT ROWID'
+                )
+                connection.execute(f'CREATE INDEX IF NOT EXISTS idx_{tier.table}_bucket ON {tier.table} (bucket)')
+                if not exists:
+                    self._backfill_rollup(connection, tier)
+
+    @staticmethod
+    def _backfill_rollup(connection, tier):
+        # Samples recorded before the rollup tables existed
+        for metric in SERIES_COLUMNS:
+            connection.execute(
+                f'INSERT INTO {tier.table} (host, metric, bucket, min, max, avg, count) '
+                f'SELECT host, ?, CAST(timestamp / ? AS INTEGER) * ?, min({metric}), max({metric}), avg({metric}), count({metric}) '
+                f'FROM samples WHERE {metric} IS NOT NULL GROUP BY host, 3',
+                (metric, tier.resolution, tier.resolution)
+            )
+
+    def append(self, snapshot):
+        self.append_rows([(
+            snapshot.timestamp,
+            snapshot.cpu['percentage'],
+            snapshot.ram['percentage'],
+            snapshot.disk['percentage'],
+            snapshot.network['upload_speed'],
+            snapshot.network['download_speed']
+        )])
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'append_rows')
+    def append_rows(self, rows, host=LOCAL_HOST):
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                self._insert_samples(connection, rows, host)
+        self._ensure_pruner()
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'ingest')
+    def ingest(self, host, rows, address=None, system_info=None, now=None):
+        """Store a batch of agent samples and update the host's latest values.
+
+        ``rows`` are ``(timestamp, cpu, ram, disk, upload, download)`` tuples;
+        everything is written in one transaction.
+        """
+        now = time.time() if now is None else now
+        info = json.dumps(system_info, separators=(',', ':')) if system_info is not None else None
+        with self._write_lock:
+            connection = self._connection()
+            with connection:
+                self._insert_samples(connection, rows, host)
+                connection.execute(
+                    'INSERT INTO hosts (host, address, first_seen, last_seen, system_info) '
+                    'VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (host) DO UPDATE SET '
+                    'address = excluded.address, '
+                    'last_seen = excluded.last_seen, '
+                    'system_info = coalesce(excluded.system_info, hosts.system_info)',
+                    (host, address, now, now, info)
+                )
+                if rows:
+                    # Batches can arrive out of order after an agent retries
+                    latest = max(rows, key=lambda row: row[0])
+                    connection.execute(
+                        'UPDATE hosts SET timestamp = ?, cpu = ?, ram = ?, disk = ?, upload = ?, download = ? '
+                        'WHERE host = ? AND (timestamp IS NULL OR timestamp <= ?)',
+                        (*latest, host, latest[0])
+                    )
+        self._ensure_pruner()
+
+    def _insert_samples(self, connection, rows, host):
+        connection.executemany(
+            'INSERT INTO samples (timestamp, cpu, ram, disk, upload, download, host) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(*row, host) for row in rows]
+        )
+        for tier in ROLLUP_TIERS:
+            connection.executemany(
+                f'INSERT INTO {tier.table} (host, metric, bucket, min, max, avg, count) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (host, metric, bucket) DO UPDATE SET '
+                'min = min(min, excluded.min), '
+                'max = max(max, excluded.max), '
+                'avg = (avg * count + excluded.avg * excluded.count) / (count + excluded.count), '
+                'count = count + excluded.count',
+                [(host, metric, bucket, low, high, total / count, count)
+                 for (metric, bucket), (low, high, total, count) in _aggregate(rows, tier.resolution).items()]
+            )
+
+    def _ensure_pruner(self):
+        if self._pruner is not None and self._pruner[0] == os.getpid():
+            return
+        thread = threading.Thread(target=self._prune_loop, name='metrics-pruner', daemon=True)
+        # Remember the owning pid: threads do not survive a fork
+        self._pruner = (os.getpid(), thread)
+        thread.start()
+
+    def _prune_loop(self):
+        while True:
+            try:
+                self.prune()
+            except Exception:
+                logger.exception('Failed to prune the metrics store')
+            time.sleep(PRUNE_INTERVAL)
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'prune')
+    def prune(self, now=None, batch=PRUNE_BATCH):
+        """Delete rows older than each tier's retention; returns how many.
+
+        Each batch of at most ``batch`` rows is its own transaction, so
+        appends interleave with a long prune instead of waiting for it.
+        """
+        now = time.time() if now is None else now
+        connection = self._connection()
+        hosts = [LOCAL_HOST] + [row[0] for row in connection.execute('SELECT host FROM hosts')]
+        # samples is indexed by (host, timestamp), so delete host by host
+        cutoff = now - self.retention['raw']
+        deleted = sum(self._delete_batches(
+            'DELETE FROM samples WHERE rowid IN '
+            '(SELECT rowid FROM samples WHERE host = ? AND timestamp < ? LIMIT ?)',
+            (host, cutoff), batch
+        ) for host in hosts)
+        for tier in ROLLUP_TIERS:
+            deleted += self._delete_batches(
+                f'DELETE FROM {tier.table} WHERE (host, metric, bucket) IN '
+                f'(SELECT host, metric, bucket FROM {tier.table} WHERE bucket < ? LIMIT ?)',
+                (now - self.retention[tier.name],), batch
+            )
+        return deleted
+
+    def _delete_batches(self, statement, parameters, batch):
+        connection = self._connection()
+        deleted = 0
+        while True:
+            with self._write_lock:
+                with connection:
+                    count = connection.execute(statement, (*parameters, batch)).rowcount
+            deleted += count
+            if count < batch:
+                return deleted
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'hosts')
+    def hosts(self):
+        cursor = self._connection().execute(
+            'SELECT host, address, first_seen, last_seen, timestamp, '
+            'cpu, ram, disk, upload, download, system_info FROM hosts ORDER BY host'
+        )
+        names = [description[0] for description in cursor.description]
+        hosts = []
+        for row in cursor:
+            host = dict(zip(names, row))
+            host['system_info'] = json.loads(host['system_info']) if host['system_info'] else None
+            hosts.append(host)
+        return hosts
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'last_points')
+    def last_points(self, count, host=LOCAL_HOST):
+        rows = self._connection().execute(
+            'SELECT timestamp, cpu, ram, disk, upload, download FROM samples '
+            'WHERE host = ? ORDER BY timestamp DESC LIMIT ?',
+            (host, count)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'last_minutes')
+    def last_minutes(self, minutes, now=None, host=LOCAL_HOST):
+        since = (now or time.time()) - minutes * 60
+        return self._connection().execute(
+            'SELECT timestamp, cpu, ram, disk, upload, download FROM samples '
+            'WHERE host = ? AND timestamp >= ? ORDER BY timestamp',
+            (host, since)
+        ).fetchall()
+
+    @instrumentation.timed('db_query_duration_seconds', 'metrics', 'range')
+    def query_range(self, metric, start, end, step, host=LOCAL_HOST, now=None):
+        """Aggregate one metric over ``[start, end)`` in ``step``-second slots.
+
+        Reads the tier chosen by ``plan_tier``. Rollup reads align ``start``
+        down to the tier's resolution and round ``step`` up to a whole number
+        of buckets, so every bucket falls in exactly one slot; the adjusted
+        values are reported in the result. Returns a
+        RangeResult whose points are ``(slot_start, min, max, avg, count)``;
+        empty slots are left out.
+        """
+        if metric not in SERIES_COLUMNS:
+            raise ValueError(f'unknown metric {metric!r}')
+        tier = plan_tier(start, step, self.retention, time.time() if now is None else now)
+        if tier.table == 'samples':
+            cursor = self._connection().execute(
+                f'SELECT CAST((timestamp - ?) / ? AS INTEGER) AS slot, '
+                f'min({metric}), max({metric}), avg({metric}), count({metric}) '
+                f'FROM samples WHERE host = ? AND timestamp >= ? AND timestamp < ? AND {metric} IS NOT NULL '
+                'GROUP BY slot ORDER BY slot',
+                (start, step, host, start, end)
+            )
+        else:
+            start = start // tier.resolution * tier.resolution
+            step = math.ceil(step / tier.resolution) * tier.resolution
+            cursor = self._connection().execute(
+                'SELECT CAST((bucket - ?) / ? AS INTEGER) AS slot, '
+                'min(min), max(max), sum(avg * count) / sum(count), sum(count) '
+                f'FROM {tier.table} WHERE host = ? AND metric = ? AND bucket >= ? AND bucket < ? '
+                'GROUP BY slot ORDER BY slot',
+                (start, step, host, metric, start, end)
+            )
+        points = [(start + slot * step, low, high, mean, count) for slot, low, high, mean, count in cursor]
+        return RangeResult(tier.name, start, step, points)
+
+    def last_sample_id(self):
+        return self._connection().execute('SELECT max(id) FROM samples').fetchone()[0] or 0
+
+    def samples_after(self, last_id, limit=10000, columns=SERIES_COLUMNS, since=None):
+        """Samples of every host with ``id > last_id`` in insertion order.
+
+        Rows are ``(id, host, timestamp, *columns)``; pass the last id back to
+        read the next ones. ``since`` skips samples taken before it.
+        """
+        unknown = set(columns) - set(SERIES_COLUMNS)
+        if unknown:
+            raise ValueError(f'unknown columns: {", ".join(sorted(unknown))}')
+        since_clause = ' AND timestamp >= ?' if since is not None else ''
+        return self._connection().execute(
+            f'SELECT id, host, timestamp, {", ".join(columns)} FROM samples '
+            f'WHERE id > ?{since_clause} ORDER BY id LIMIT ?',
+            (last_id, since, limit) if since is not None else (last_id, limit)
+        ).fetchall()
+
+    def host_samples(self, host, since, until_id, columns=SERIES_COLUMNS):
+        """One host's samples taken since ``since`` with ``id <= until_id``.
+
+        Rows are shaped like samples_after's, but read through the
+        (host, timestamp) index, so loading a recent window does not scan
+        every host's history.
+        """
+        unknown = set(columns) - set(SERIES_COLUMNS)
+        if unknown:
+            raise ValueError(f'unknown columns: {", ".join(sorted(unknown))}')
+        return self._connection().execute(
+            f'SELECT id, host, timestamp, {", ".join(columns)} FROM samples '
+            'WHERE host = ? AND timestamp >= ? AND id <= ? ORDER BY timestamp',
+            (host, since, until_id)
+        ).fetchall()
+
+    def iter_samples(self, start, end, host=LOCAL_HOST, batch=1000):
+        """Raw samples in ``[start, end)``, oldest first, read ``batch`` rows at a time."""
+        cursor = self._connection().execute(
+            'SELECT timestamp, cpu, ram, disk, upload, download FROM samples '
+            'WHERE host = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp',
+            (host, start, end)
+        )
+        return _fetch_batches(cursor, batch)
+
+    def iter_rollups(self, tier_name, start, end, host=LOCAL_HOST, batch=1000):
+        """Rollup rows ``(bucket, metric, min, max, avg, count)`` of one tier in ``[start, end)``.
+
+        Ordered by metric, then bucket: the primary key order, so SQLite
+        streams rows without sorting the whole range first.
+        """
+        tier = next(tier for tier in ROLLUP_TIERS if tier.name == tier_name)
+        cursor = self._connection().execute(
+            f'SELECT bucket, metric, min, max, avg, count FROM {tier.table} '
+            'WHERE host = ? AND bucket >= ? AND bucket < ? ORDER BY metric, bucket',
+            (host, start, end)
+        )
+        return _fetch_batches(cursor, batch)
+
+    def rollups_between(self, tier_name, start, end, metrics=SERIES_COLUMNS):
+        """Rollup rows ``(host, metric, bucket, max, avg, count)`` of every host in ``[start, end)``.
+
+        Ordered by bucket, read through the tier's bucket index.
+        """
+        unknown = set(metrics) - set(SERIES_COLUMNS)
+        if unknown:
+            raise ValueError(f'unknown metrics: {", ".join(sorted(unknown))}')
+        tier = next(tier for tier in ROLLUP_TIERS if tier.name == tier_name)
+        return self._connection().execute(
+            f'SELECT host, metric, bucket, max, avg, count FROM {tier.table} '
+            f'WHERE bucket >= ? AND bucket < ? AND metric IN ({", ".join("?" * len(metrics))}) ORDER BY bucket',
+            (start, end, *metrics)
+        ).fetchall()
+
+
+def _fetch_batches(cursor, batch):
+    try:
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                return
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def plan_tier(start, step, retention, now):
+    """The tier a range query from ``start`` with ``step`` seconds should read.
+
+    The coarsest tier that still reaches back to ``start`` and whose buckets
+    are no wider than ``step``; failing that (data older than a fine tier
+    keeps), the finest tier that reaches back that far. query_range rounds
+    the step up to whole buckets of the tier it reads.
+    """
+    reachable = [tier for tier in TIERS if now - retention[tier.name] <= start] or [TIERS[-1]]
+    fitting = [tier for tier in reachable if tier.resolution <= step]
+    return fitting[-1] if fitting else reachable[0]
+
+
+def _aggregate(rows, resolution):
+    """{(metric, bucket): [min, max, sum, count]} for a batch of sample rows."""
+    buckets = {}
+    for row in rows:
+        bucket = row[0] // resolution * resolution
+        for metric, value in zip(SERIES_COLUMNS, row[1:]):
+            if value is None:
+                continue
+            aggregate = buckets.get((metric, bucket))
+            if aggregate is None:
+                buckets[(metric, bucket)] = [value, value, value, 1]
+            else:
+                if value < aggregate[0]:
+                    aggregate[0] = value
+                if value > aggregate[1]:
+                    aggregate[1] = value
+                aggregate[2] += value
+                aggregate[3] += 1
+    return buckets
+
+
+metrics_store = MetricsStore()
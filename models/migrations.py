@@ -0,0 +1,121 @@
+from sqlalchemy import text
+
+# Each migration upgrades an existing database by one schema version. The
+# version lives in SQLite's PRAGMA user_version, so a migration runs exactly
+# once per database file. Statements must be safe on databases that
+# db.create_all() just built with the current models.
+
+def _add_query_indexes(connection):
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_alerts_resolved_created_at ON alerts (resolved, created_at)'
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_alerts_alert_type_resolved ON alerts (alert_type, resolved)'
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_login_logs_user_id_login_time ON login_logs (user_id, login_time)'
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_login_logs_login_time ON login_logs (login_time)'
+    ))
+
+def _create_log_store(connection):
+    # log_entries itself is created by db.create_all(); this adds the FTS5
+    # index, the triggers that keep it in sync, and backfills history.
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS log_entries_fts USING fts5("
+        "message, content='log_entries', content_rowid='id')"
+    ))
+    connection.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS log_entries_ai AFTER INSERT ON log_entries BEGIN '
+        'INSERT INTO log_entries_fts (rowid, message) VALUES (new.id, new.message); END'
+    ))
+    connection.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS log_entries_ad AFTER DELETE ON log_entries BEGIN '
+        "INSERT INTO log_entries_fts (log_entries_fts, rowid, message) VALUES ('delete', old.id, old.message); END"
+    ))
+    connection.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS log_entries_au AFTER UPDATE OF message ON log_entries BEGIN '
+        "INSERT INTO log_entries_fts (log_entries_fts, rowid, message) VALUES ('delete', old.id, old.message); "
+        'INSERT INTO log_entries_fts (rowid, message) VALUES (new.id, new.message); END'
+    ))
+    
+    if connection.execute(text('SELECT COUNT(*) FROM log_entries')).scalar():
+        return
+    # Backfill in time order so ids stay chronological
+    connection.execute(text(
+        "INSERT INTO log_entries (timestamp, log_type, severity, message, source, source_id) "
+        "SELECT * FROM ("
+        "SELECT COALESCE(l.login_time, CURRENT_TIMESTAMP) AS timestamp, 'login', "
+        "CASE WHEN l.success THEN 'info' ELSE 'warning' END, "
+        "'User ' || COALESCE(u.username, 'unknown') || "
+        "CASE WHEN l.success THEN ' login successful' ELSE ' login failed' END || "
+        "' from ' || COALESCE(l.ip_address, 'unknown address'), 'auth_system', l.id "
+        "FROM login_logs l LEFT JOIN users u ON u.id = l.user_id "
+        "UNION ALL "
+        "SELECT COALESCE(created_at, CURRENT_TIMESTAMP), 'alerts', COALESCE(severity, 'warning'), "
+        "message, 'system_monitor', id FROM alerts"
+        ") ORDER BY timestamp"
+    ))
+
+def _create_log_stats(connection):
+    # log_stats_hourly is created by db.create_all(); buckets use the same
+    # text format SQLAlchemy stores DateTime values in.
+    bucket = "strftime('%Y-%m-%d %H:00:00.000000', {}.timestamp)"
+    connection.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS log_stats_ai AFTER INSERT ON log_entries BEGIN '
+        'INSERT INTO log_stats_hourly (bucket, log_type, severity, count) '
+        f"VALUES ({bucket.format('new')}, new.log_type, new.severity, 1) "
+        'ON CONFLICT (bucket, log_type, severity) DO UPDATE SET count = count + 1; END'
+    ))
+    connection.execute(text(
+        'CREATE TRIGGER IF NOT EXISTS log_stats_ad AFTER DELETE ON log_entries BEGIN '
+        'UPDATE log_stats_hourly SET count = count - 1 '
+        f"WHERE bucket = {bucket.format('old')} AND log_type = old.log_type AND severity = old.severity; END"
+    ))
+    connection.execute(text('DELETE FROM log_stats_hourly'))
+    connection.execute(text(
+        'INSERT INTO log_stats_hourly (bucket, log_type, severity, count) '
+        f"SELECT {bucket.format('log_entries')}, log_type, severity, COUNT(*) "
+        'FROM log_entries GROUP BY 1, 2, 3'
+    ))
+
+def _add_log_keyset_indexes(connection):
+    # Pages are keyed on (timestamp, id); the single-column type and
+    # severity indexes could not seek to a timestamp cursor
+    connection.execute(text('DROP INDEX IF EXISTS ix_log_entries_log_type'))
+    connection.execute(text('DROP INDEX IF EXISTS ix_log_entries_severity'))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_log_entries_log_type_timestamp ON log_entries (log_type, timestamp, id)'
+    ))
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_log_entries_severity_timestamp ON log_entries (severity, timestamp, id)'
+    ))
+
+MIGRATIONS = [
+    (1, 'Add indexes for alert and login log queries', _add_query_indexes),
+    (2, 'Add unified log store with full-text search', _create_log_store),
+    (3, 'Add hourly log counters', _create_log_stats),
+    (4, 'Key log pages on timestamp and id', _add_log_keyset_indexes),
+]
+
+def schema_version(connection):
+    return connection.execute(text('PRAGMA user_version')).scalar()
+
+def run_migrations(engine):
+    applied = []
+    with engine.begin() as connection:
+        current = schema_version(connection)
+    
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(text(f'PRAGMA user_version = {version}'))
+        applied.append((version, description))
+    
+    if applied:
+        with engine.begin() as connection:
+            connection.execute(text('ANALYZE'))
+    return applied
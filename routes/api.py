@@ -1,129 +1,410 @@
-from flask import Blueprint, jsonify, session
+from flask import Blueprint, Response, abort, jsonify, session, current_app, request, stream_with_context
 from utils.system_monitor import SystemMonitor
-from models.database import db, Alert
+from utils.collector import MetricsCollector, PUBLIC_FIELDS
+from utils.alert_engine import alert_engine
+from utils.anomaly import anomaly_watcher
+from utils.snapshot_channel import SnapshotReader
+from utils.downsampling import downsample
+from utils.export import FORMATS, export_response
+from utils.summary import metric_summaries, top_k, QUANTILES
+from models.database import db, Alert, persist
+from models.metrics_store import metrics_store, LOCAL_HOST, SERIES_COLUMNS, ROLLUP_TIERS
 from datetime import datetime
+import gzip
+import json
+import math
 import random
+import threading
+import time
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 system_monitor = SystemMonitor()
+collector = MetricsCollector(system_monitor, store=metrics_store, alert_engine=alert_engine, anomalies=anomaly_watcher)
+
+MAX_HISTORY_POINTS = 5000
+# Column (or columns summed) of a samples row that drives downsampling per series
+HISTORY_SERIES = {'cpu': 1, 'ram': 2, 'disk': 3, 'network': (4, 5)}
+MAX_RANGE_POINTS = 11000
+DEFAULT_RANGE_POINTS = 300
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+DEFAULT_SUMMARY_WINDOWS = '5m,1h,24h'
+DEFAULT_SUMMARY_TOP = 5
+MAX_SUMMARY_TOP = 100
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_RETRY_MS = 3000
+STREAM_BUSY_RETRY_SECONDS = 30
+
+GZIP_MIN_BYTES = 1024
+DEVICE_KINDS = ('cpu', 'disk', 'nic')
+
+_encoded_event = (None, None)
+_encoded_metrics = (None, {})
+_MISSING = object()
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+@api_bp.record_once
+def configure_collector(state):
+    # In multi-process deployments a dedicated collector process samples
+    # psutil (see collector_service.py); workers only read its snapshots.
+    global collector
+    if state.app.config.get('COLLECTOR_MODE') == 'external':
+        collector = SnapshotReader(state.app.config['SNAPSHOT_PATH'])
+
+@api_bp.before_app_request
+def ensure_collector_running():
+    collector.start(current_app.config.get('COLLECTOR_INTERVAL'))
+    # Load summary buffers in the background before anyone asks for them
+    metric_summaries.start()
+
+def snapshot_response(data, snapshot):
+    response = jsonify(data)
+    response.headers['X-Snapshot-Age'] = f'{snapshot.age:.3f}'
+    response.headers['X-Snapshot-Sequence'] = str(snapshot.sequence)
+    return response
+
+def encode_stream_event(snapshot):
+    # Every subscriber receives the same bytes for a tick, so encode once.
+    global _encoded_event
+    sequence, event = _encoded_event
+    if sequence != snapshot.sequence:
+        # The collector keeps the body encoded (workers read it from shared memory)
+        data = collector.encoded(snapshot)
+        event = f'id: {collector.event_id(snapshot)}\nevent: metrics\ndata: '.encode() + data + b'\n\n'
+        _encoded_event = (snapshot.sequence, event)
+    return event
+
+def changed_values(old, new):
+    # Dicts are diffed one level deep and also give the keys they lost, so
+    # null stays an ordinary value; anything else is sent whole when it
+    # differs. Returns (changed, removed keys); _MISSING means unchanged.
+    if old == new:
+        return _MISSING, []
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = {key: value for key, value in new.items() if old.get(key, _MISSING) != value}
+        return changed, [key for key in old if key not in new]
+    return new, []
+
+def encode_all_metrics(snapshot, version, since=None):
+    # Bodies depend only on (version, since), so concurrent pollers share one
+    # serialization (and one gzip) per tick. Returns [body, gzipped body].
+    global _encoded_metrics
+    cached_version, bodies = _encoded_metrics
+    if cached_version != version:
+        bodies = {}
+        _encoded_metrics = (version, bodies)
+    
+    base = collector.snapshot_at(since) if since else None
+    key = since if base is not None else None
+    encoded = bodies.get(key)
+    if encoded is None and base is None:
+        # The full body is the one the stream sends
+        encoded = bodies[key] = [collector.encoded(snapshot), None]
+    elif encoded is None:
+        data = {}
+        for field in PUBLIC_FIELDS:
+            changed, removed = changed_values(getattr(base, field), getattr(snapshot, field))
+            if changed is not _MISSING:
+                data[field] = changed
+            if removed:
+                data.setdefault('removed', {})[field] = removed
+        # Unix seconds, as in the stream and /api/historical-data
+        data['timestamp'] = snapshot.timestamp
+        data['sequence'] = snapshot.sequence
+        data['version'] = version
+        data['since'] = since
+        encoded = bodies[key] = [json.dumps(data, separators=(',', ':')).encode(), None]
+    return encoded
 
 @api_bp.route('/cpu')
 def get_cpu():
-    data = system_monitor.get_cpu_usage()
-    return jsonify(data)
+    snapshot = collector.latest()
+    return snapshot_response(snapshot.cpu, snapshot)
 
 @api_bp.route('/ram')
 def get_ram():
-    data = system_monitor.get_ram_usage()
-    return jsonify(data)
+    snapshot = collector.latest()
+    return snapshot_response(snapshot.ram, snapshot)
 
 @api_bp.route('/disk')
 def get_disk():
-    data = system_monitor.get_disk_usage()
-    return jsonify(data)
+    snapshot = collector.latest()
+    return snapshot_response(snapshot.disk, snapshot)
 
 @api_bp.route('/network')
 def get_network():
-    data = system_monitor.get_network_activity()
-    return jsonify(data)
+    snapshot = collector.latest()
+    return snapshot_response(snapshot.network, snapshot)
+
+@api_bp.route('/devices')
+def get_devices():
+    snapshot = collector.latest()
+    kinds = [kind for kind in request.args.get('kind', ','.join(DEVICE_KINDS)).split(',') if kind]
+    unknown = set(kinds) - set(DEVICE_KINDS)
+    if unknown:
+        return jsonify({'error': f'kind must be a comma-separated subset of {", ".join(DEVICE_KINDS)}'}), 400
+    
+    data = {}
+    for kind in kinds:
+        devices = snapshot.devices.get(kind) or {'names': []}
+        wanted = request.args.get(kind)
+        if wanted:
+            # Only the devices the caller displays, e.g. ?nic=eth0,eth1
+            wanted = set(wanted.split(','))
+            keep = [index for index, name in enumerate(devices['names']) if name in wanted]
+            devices = {field: [values[index] for index in keep] for field, values in devices.items()}
+        data[kind] = devices
+    return snapshot_response(data, snapshot)
 
 @api_bp.route('/processes')
 def get_processes():
-    data = system_monitor.get_processes()
-    return jsonify(data)
+    snapshot = collector.latest()
+    return snapshot_response(snapshot.processes, snapshot)
 
 @api_bp.route('/system-info')
 def get_system_info():
-    data = system_monitor.get_system_info()
-    return jsonify(data)
+    snapshot = collector.latest()
+    return snapshot_response(snapshot.system_info, snapshot)
 
 @api_bp.route('/alerts')
 def get_alerts():
-    current_alerts = system_monitor.check_alerts()
-    
-    for alert_data in current_alerts:
-        existing_alert = Alert.query.filter_by(
-            alert_type=alert_data['type'],
-            resolved=False
-        ).first()
-        
-        if not existing_alert:
-            new_alert = Alert(
-                alert_type=alert_data['type'],
-                message=alert_data['message'],
-                severity=alert_data['severity']
-            )
-            db.session.add(new_alert)
-    
-    unresolved_alerts = Alert.query.filter_by(resolved=False).order_by(Alert.created_at.desc()).all()
-    
-    alert_list = []
-    for alert in unresolved_alerts:
-        alert_list.append({
-            'id': alert.id,
-            'type': alert.alert_type,
-            'message': alert.message,
-            'severity': alert.severity,
-            'created_at': alert.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        })
-    
-    return jsonify(alert_list)
-
-@api_bp.route('/resolve-alert/<int:alert_id>')
-def resolve_alert(alert_id):
-    alert = Alert.query.get_or_404(alert_id)
+    snapshot = collector.latest()
+    # The engine only runs where the collector samples; elsewhere the
+    # snapshot carries the open alerts as of the last tick.
+    alerts = alert_engine.open_alerts() if alert_engine.active else snapshot.alerts
+    return snapshot_response(alerts, snapshot)
+
+def resolve_alert_row(alert_id):
+    alert = db.session.get(Alert, alert_id)
+    if alert is None:
+        return False
     alert.resolve()
-    db.session.commit()
+    return True
+
+@api_bp.route('/resolve-alert/<int:alert_id>', methods=['POST'])
+def resolve_alert(alert_id):
+    if alert_engine.resolve(alert_id):
+        alert_engine.flush()
+    elif not persist(resolve_alert_row, alert_id).result():
+        abort(404)
     return jsonify({'success': True})
 
 @api_bp.route('/all-metrics')
 def get_all_metrics():
+    snapshot = collector.latest()
+    version = collector.event_id(snapshot)
+    
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        encoded = encode_all_metrics(snapshot, version, request.args.get('since'))
+        body = encoded[0]
+        response = Response(body, mimetype='application/json')
+        if len(body) >= GZIP_MIN_BYTES and request.accept_encodings['gzip']:
+            if encoded[1] is None:
+                encoded[1] = gzip.compress(body, 6)
+            response.set_data(encoded[1])
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['X-Snapshot-Age'] = f'{snapshot.age:.3f}'
+    response.headers['X-Snapshot-Sequence'] = str(snapshot.sequence)
+    return response
+
+def parse_time(value, default):
+    # Unix seconds or ISO 8601 (naive times are UTC, like the stored timestamps)
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        return (parsed - datetime(1970, 1, 1)).total_seconds()
+    return parsed.timestamp()
+
+def parse_duration(value):
+    # Seconds, or a number with an s/m/h/d suffix
+    if value[-1:] in DURATION_UNITS:
+        return float(value[:-1]) * DURATION_UNITS[value[-1]]
+    return float(value)
+
+@api_bp.route('/metrics/range')
+def get_metrics_range():
+    metric = request.args.get('metric', 'cpu')
+    host = request.args.get('host', LOCAL_HOST)
+    try:
+        end = parse_time(request.args.get('end'), time.time())
+        start = parse_time(request.args.get('start'), end - 3600)
+        step = request.args.get('step')
+        step = parse_duration(step) if step else max(1, math.ceil((end - start) / DEFAULT_RANGE_POINTS))
+    except ValueError as error:
+        return jsonify({'error': f'invalid range: {error}'}), 400
+    
+    if metric not in SERIES_COLUMNS:
+        return jsonify({'error': f'metric must be one of {", ".join(SERIES_COLUMNS)}'}), 400
+    if not (math.isfinite(start) and math.isfinite(end) and end > start):
+        return jsonify({'error': 'end must be after start'}), 400
+    if not math.isfinite(step) or step <= 0 or (end - start) / step > MAX_RANGE_POINTS:
+        return jsonify({'error': f'step must be positive and give at most {MAX_RANGE_POINTS} points'}), 400
+    
+    result = metrics_store.query_range(metric, start, end, step, host=host)
     return jsonify({
-        'cpu': system_monitor.get_cpu_usage(),
-        'ram': system_monitor.get_ram_usage(),
-        'disk': system_monitor.get_disk_usage(),
-        'network': system_monitor.get_network_activity(),
-        'processes': system_monitor.get_processes(),
-        'system_info': system_monitor.get_system_info(),
-        'timestamp': datetime.now().isoformat()
+        'metric': metric,
+        'host': host,
+        'start': result.start,
+        'end': end,
+        'step': result.step,
+        'tier': result.tier,
+        'points': [
+            {'timestamp': timestamp, 'min': low, 'max': high, 'avg': mean, 'count': count}
+            for timestamp, low, high, mean, count in result.points
+        ]
     })
 
+def summary_value(value):
+    return None if math.isnan(value) else round(float(value), 3)
+
+@api_bp.route('/metrics/summary')
+def get_metrics_summary():
+    names = [name.strip() for name in request.args.get('windows', DEFAULT_SUMMARY_WINDOWS).split(',') if name.strip()]
+    try:
+        windows = {name: parse_duration(name) for name in names}
+    except ValueError as error:
+        return jsonify({'error': f'invalid window: {error}'}), 400
+    top = request.args.get('top', DEFAULT_SUMMARY_TOP, type=int)
+    
+    if not windows or not all(0 < length <= metric_summaries.span for length in windows.values()):
+        return jsonify({'error': f'windows must be between 0 and {metric_summaries.span:g} seconds'}), 400
+    if top is None or not 0 <= top <= MAX_SUMMARY_TOP:
+        return jsonify({'error': f'top must be between 0 and {MAX_SUMMARY_TOP}'}), 400
+    
+    summary = metric_summaries.summarize(windows)
+    if summary is None:
+        return jsonify({'error': 'Summaries are still loading'}), 503, {'Retry-After': '1'}
+    hosts, metrics = summary['hosts'], summary['metrics']
+    labels = [f'p{quantile * 100:g}' for quantile in QUANTILES]
+    ranked_by = labels.index('p95')
+    rows = [{'host': host} for host in hosts]
+    ranking = {metric: {} for metric in metrics}
+    for name, (quantiles, mean, maximum, count) in summary['windows'].items():
+        for row, host_quantiles, host_mean, host_max, host_count in zip(rows, quantiles, mean, maximum, count):
+            for index, metric in enumerate(metrics):
+                stats = dict(zip(labels, map(summary_value, host_quantiles[index])))
+                stats.update(mean=summary_value(host_mean[index]), max=summary_value(host_max[index]),
+                             count=int(host_count[index]))
+                row.setdefault(metric, {})[name] = stats
+        for index, metric in enumerate(metrics):
+            scores = quantiles[:, index, ranked_by]
+            ranking[metric][name] = [
+                {'host': hosts[position], 'p95': summary_value(scores[position])} for position in top_k(scores, top)
+            ]
+    
+    return jsonify({
+        'windows': windows,
+        'hosts': rows,
+        'top': ranking
+    })
+
+@api_bp.route('/metrics/export')
+def export_metrics():
+    export_format = request.args.get('format', 'csv')
+    tier = request.args.get('tier', 'raw')
+    host = request.args.get('host', LOCAL_HOST)
+    try:
+        end = parse_time(request.args.get('end'), time.time())
+        start = parse_time(request.args.get('start'), end - 86400)
+    except ValueError as error:
+        return jsonify({'error': f'invalid range: {error}'}), 400
+    
+    if export_format not in FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(FORMATS)}'}), 400
+    tiers = ['raw'] + [rollup.name for rollup in ROLLUP_TIERS]
+    if tier not in tiers:
+        return jsonify({'error': f'tier must be one of {", ".join(tiers)}'}), 400
+    
+    if tier == 'raw':
+        fields = ('timestamp',) + SERIES_COLUMNS
+        rows = metrics_store.iter_samples(start, end, host=host)
+    else:
+        fields = ('timestamp', 'metric', 'min', 'max', 'avg', 'count')
+        rows = metrics_store.iter_rollups(tier, start, end, host=host)
+    return export_response(fields, rows, export_format, f'metrics-{host or "local"}-{tier}',
+                           compress=request.args.get('gzip', type=int) == 1)
+
+def acquire_stream_slot():
+    # Each open stream holds a worker thread for its whole lifetime
+    global _open_streams
+    limit = current_app.config.get('STREAM_MAX_CLIENTS')
+    with _streams_lock:
+        if limit is not None and _open_streams >= limit:
+            return False
+        _open_streams += 1
+    return True
+
+def release_stream_slot():
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+@api_bp.route('/stream')
+def stream_metrics():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    backlog = collector.snapshots_since(last_event_id)
+    if not acquire_stream_slot():
+        return jsonify({'error': 'Too many open streams, poll /api/all-metrics instead'}), 503, {
+            'Retry-After': str(STREAM_BUSY_RETRY_SECONDS)
+        }
+    
+    def generate():
+        yield f'retry: {STREAM_RETRY_MS}\n\n'
+        # An up-to-date client gets no backlog and waits for the next snapshot
+        sequence = collector.parse_event_id(last_event_id) or 0
+        for snapshot in backlog:
+            yield encode_stream_event(snapshot)
+            sequence = snapshot.sequence
+        
+        while True:
+            snapshot = collector.wait_for_update(sequence, timeout=STREAM_KEEPALIVE_SECONDS)
+            if snapshot is None:
+                yield ': keep-alive\n\n'
+                continue
+            yield encode_stream_event(snapshot)
+            sequence = snapshot.sequence
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if it was never iterated
+    response.call_on_close(release_stream_slot)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_bp.route('/historical-data')
 def get_historical_data():
+    host = request.args.get('host', LOCAL_HOST)
+    minutes = request.args.get('minutes', type=float)
+    points = request.args.get('points', type=int)
+    width = request.args.get('width', type=int)
+    if minutes:
+        rows = metrics_store.last_minutes(minutes, host=host)
+        target = width or points or MAX_HISTORY_POINTS
+    else:
+        rows = metrics_store.last_points(max(1, min(points or 20, MAX_HISTORY_POINTS)), host=host)
+        target = width
+    
+    # Long ranges are thinned with LTTB so peaks survive and the payload stays bounded
+    series = {'cpu': rows, 'ram': rows, 'disk': rows, 'network': rows}
+    if target:
+        series = downsample(rows, max(3, min(target, MAX_HISTORY_POINTS)), HISTORY_SERIES)
+    
     historical_data = {
-        'cpu': [],
-        'ram': [],
-        'disk': [],
-        'network': []
+        'cpu': [{'timestamp': row[0], 'value': row[1]} for row in series['cpu']],
+        'ram': [{'timestamp': row[0], 'value': row[2]} for row in series['ram']],
+        'disk': [{'timestamp': row[0], 'value': row[3]} for row in series['disk']],
+        'network': [{'timestamp': row[0], 'upload': row[4], 'download': row[5]} for row in series['network']]
     }
     
-    for i in range(20):
-        timestamp = datetime.now().timestamp() - (19 - i) * 120
-        
-        cpu_data = system_monitor.get_cpu_usage()
-        ram_data = system_monitor.get_ram_usage()
-        disk_data = system_monitor.get_disk_usage()
-        network_data = system_monitor.get_network_activity()
-        
-        historical_data['cpu'].append({
-            'timestamp': timestamp,
-            'value': cpu_data['percentage']
-        })
-        
-        historical_data['ram'].append({
-            'timestamp': timestamp,
-            'value': ram_data['percentage']
-        })
-        
-        historical_data['disk'].append({
-            'timestamp': timestamp,
-            'value': disk_data['percentage']
-        })
-        
-        historical_data['network'].append({
-            'timestamp': timestamp,
-            'upload': network_data['upload_speed'],
-            'download': network_data['download_speed']
-        })
-    
     return jsonify(historical_data)
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from models.database import db, User, LoginLog
-from datetime import datetime
+from models.database import User, record_login
+from utils.password_pool import password_pool, PasswordPoolBusy
 import functools
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
@@ -25,33 +25,24 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password) and user.is_active:
+        try:
+            valid = user is not None and password_pool.check(password, user.password_hash)
+        except PasswordPoolBusy:
+            flash('The server is busy, please try again in a moment', 'error')
+            return render_template('login_simple.html'), 503, {'Retry-After': '1'}
+        
+        if valid and user.is_active:
             session['user_id'] = user.id
             session['username'] = user.username
             
-            # Create successful login log
-            login_log = LoginLog(
-                user_id=user.id,
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent'),
-                success=True
-            )
-            db.session.add(login_log)
-            db.session.commit()
+            record_login(user.id, request.remote_addr, request.headers.get('User-Agent'), success=True)
             
             flash('Login successful!', 'success')
             return redirect(url_for('main.dashboard'))
         else:
             # For failed login, only create log if user exists (to avoid NULL constraint)
             if user:
-                login_log = LoginLog(
-                    user_id=user.id,
-                    ip_address=request.remote_addr,
-                    user_agent=request.headers.get('User-Agent'),
-                    success=False
-                )
-                db.session.add(login_log)
-                db.session.commit()
+                record_login(user.id, request.remote_addr, request.headers.get('User-Agent'), success=False)
             
             flash('Invalid username or password', 'error')
             return render_template('login_simple.html')
@@ -61,14 +52,7 @@ def login():
 @auth_bp.route('/logout')
 def logout():
     if 'user_id' in session:
-        login_log = LoginLog(
-            user_id=session['user_id'],
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            success=False
-        )
-        db.session.add(login_log)
-        db.session.commit()
+        record_login(session['user_id'], request.remote_addr, request.headers.get('User-Agent'), success=False)
     
     session.clear()
     flash('You have been logged out', 'info')
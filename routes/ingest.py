@@ -0,0 +1,79 @@
+from flask import Blueprint, current_app, jsonify, request
+from models.metrics_store import metrics_store, LOCAL_HOST, SERIES_COLUMNS
+from utils.wire_format import CONTENT_TYPE, decode_batch
+import hmac
+import math
+import time
+
+ingest_bp = Blueprint('ingest', __name__, url_prefix='/api')
+
+MAX_BATCH_SAMPLES = 3600
+MAX_HOST_LENGTH = 255
+SAMPLE_WIDTH = len(SERIES_COLUMNS) + 1
+
+def ingest_authorized():
+    token = current_app.config.get('INGEST_TOKEN')
+    if not token:
+        return True
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+def parse_samples(samples):
+    # Each sample is [timestamp, cpu, ram, disk, upload, download]
+    rows = []
+    for sample in samples:
+        if not isinstance(sample, list) or len(sample) != SAMPLE_WIDTH:
+            raise ValueError(f'samples must be [timestamp, {", ".join(SERIES_COLUMNS)}] arrays')
+        row = tuple(float(value) for value in sample)
+        if not all(math.isfinite(value) for value in row):
+            raise ValueError('sample values must be finite numbers')
+        rows.append(row)
+    return rows
+
+def parse_json_batch():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        raise ValueError('Expected a JSON object')
+    samples = payload.get('samples', [])
+    if not isinstance(samples, list) or len(samples) > MAX_BATCH_SAMPLES:
+        raise ValueError(f'samples must be a list of at most {MAX_BATCH_SAMPLES} entries')
+    return payload.get('host'), parse_samples(samples), payload.get('system_info')
+
+def parse_binary_batch():
+    batch = decode_batch(request.get_data())
+    if len(batch) > MAX_BATCH_SAMPLES:
+        raise ValueError(f'Batches are limited to {MAX_BATCH_SAMPLES} samples')
+    for name in SERIES_COLUMNS:
+        if not all(map(math.isfinite, batch.columns.get(name, ()))):
+            raise ValueError('sample values must be finite numbers')
+    return batch.host, batch.rows(SERIES_COLUMNS), batch.system_info
+
+@ingest_bp.route('/ingest', methods=['POST'])
+def ingest():
+    if not ingest_authorized():
+        return jsonify({'error': 'Invalid ingest token'}), 401
+
+    try:
+        if request.mimetype == CONTENT_TYPE:
+            host, rows, system_info = parse_binary_batch()
+        else:
+            host, rows, system_info = parse_json_batch()
+    except (TypeError, ValueError) as error:
+        # Includes WireFormatError
+        return jsonify({'error': str(error)}), 400
+
+    if not isinstance(host, str) or host == LOCAL_HOST or len(host) > MAX_HOST_LENGTH:
+        return jsonify({'error': 'host must be a non-empty string'}), 400
+    if system_info is not None and not isinstance(system_info, dict):
+        return jsonify({'error': 'system_info must be an object'}), 400
+
+    metrics_store.ingest(host, rows, address=request.remote_addr, system_info=system_info)
+    return jsonify({'accepted': len(rows)})
+
+@ingest_bp.route('/hosts')
+def list_hosts():
+    now = time.time()
+    offline_after = current_app.config.get('HOST_OFFLINE_SECONDS', 60)
+    hosts = metrics_store.hosts()
+    for host in hosts:
+        host['online'] = now - host['last_seen'] < offline_after
+    return jsonify(hosts)
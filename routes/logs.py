@@ -1,89 +1,165 @@
 from flask import Blueprint, render_template, request, jsonify
-from models.database import db, LoginLog, Alert
+from models.database import db, LoginLog, Alert, LogEntry, LogStatsHourly
+from utils.export import FORMATS, export_response
+from sqlalchemy import column, func, table, text, tuple_
 from datetime import datetime, timedelta
-import random
+import re
 
 logs_bp = Blueprint('logs', __name__)
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH = 1000
+MAX_DATE_RANGE_DAYS = 3650
+EXPORT_FIELDS = ('id', 'timestamp', 'type', 'severity', 'message', 'source')
+
+log_entries_fts = table('log_entries_fts', column('rowid'))
+FTS_MATCH = text('log_entries_fts MATCH :match')
+
+def fts_query(search):
+    # Quote every word so user input can never be parsed as FTS5 syntax;
+    # the trailing * makes each word a prefix match.
+    words = re.findall(r'\w+', search)
+    return ' '.join(f'"{word}"*' for word in words)
+
+def parse_cursor(value):
+    # "<timestamp>_<id>" of the last entry on the previous page
+    timestamp, _, entry_id = value.rpartition('_')
+    return datetime.fromisoformat(timestamp), int(entry_id)
+
+def page_cursor(entry):
+    return f'{entry.timestamp.isoformat()}_{entry.id}'
+
+def parse_date_range(value):
+    # Days back from now, or None for 'all'; raises ValueError when invalid
+    if value == 'all':
+        return None
+    days = float(value)
+    if not 0 < days <= MAX_DATE_RANGE_DAYS:
+        raise ValueError(value)
+    return days
+
+def filtered_logs(log_type='all', severity='all', days=1, search='', cursor=None):
+    query = LogEntry.query
+    
+    match = fts_query(search) if search else ''
+    if match:
+        # Drive the query from the FTS index so it walks matches newest
+        # first and stops at the page limit instead of collecting them all.
+        # The index is in id order, so searches page on id alone.
+        query = query.join(log_entries_fts, log_entries_fts.c.rowid == LogEntry.id)
+        query = query.filter(FTS_MATCH.bindparams(match=match))
+        order = (log_entries_fts.c.rowid.desc(),)
+    else:
+        # Pages are keyed on (timestamp, id): the timestamp index, and the
+        # type/severity indexes that continue with (timestamp, id), seek
+        # straight to the cursor however long the date range is.
+        order = (LogEntry.timestamp.desc(), LogEntry.id.desc())
+    
+    if log_type != 'all':
+        query = query.filter(LogEntry.log_type == log_type)
+    
+    if severity != 'all':
+        query = query.filter(LogEntry.severity == severity)
+    
+    if days is not None:
+        query = query.filter(LogEntry.timestamp >= datetime.utcnow() - timedelta(days=days))
+    
+    if cursor is not None:
+        if match:
+            query = query.filter(log_entries_fts.c.rowid < cursor[1])
+        else:
+            query = query.filter(tuple_(LogEntry.timestamp, LogEntry.id) < tuple_(*cursor))
+    
+    return query.order_by(*order)
+
 @logs_bp.route('/logs')
 def logs_page():
     return render_template('logs.html')
 
 @logs_bp.route('/api/logs')
 def get_logs():
-    log_type = request.args.get('type', 'all')
-    severity = request.args.get('severity', 'all')
-    date_range = request.args.get('date_range', '1')
-    search = request.args.get('search', '')
-    
-    # Generate sample logs if database is empty
-    logs = []
-    
-    # Add login logs
-    for i in range(10):
-        logs.append({
-            'id': i + 1,
-            'timestamp': (datetime.now() - timedelta(hours=random.randint(0, 24))).strftime('%Y-%m-%d %H:%M:%S'),
-            'type': 'login',
-            'severity': 'info' if random.random() > 0.2 else 'warning',
-            'message': f'User {"admin" if random.random() > 0.3 else "unknown"} {"login successful" if random.random() > 0.2 else "login failed"}',
-            'source': 'auth_system'
-        })
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    try:
+        days = parse_date_range(request.args.get('date_range', '1'))
+    except ValueError:
+        return jsonify({'error': f'date_range must be all or 0-{MAX_DATE_RANGE_DAYS} days'}), 400
+    try:
+        cursor = parse_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'invalid cursor'}), 400
+    query = filtered_logs(
+        log_type=request.args.get('type', 'all'),
+        severity=request.args.get('severity', 'all'),
+        days=days,
+        search=request.args.get('search', ''),
+        cursor=cursor
+    )
     
-    # Add system alerts
-    for i in range(15):
-        severity_options = ['info', 'warning', 'error', 'critical']
-        messages = [
-            'CPU usage exceeded threshold',
-            'Memory usage high',
-            'Disk space low',
-            'Network connection lost',
-            'Service restarted',
-            'Backup completed',
-            'System update available'
-        ]
-        
-        logs.append({
-            'id': i + 11,
-            'timestamp': (datetime.now() - timedelta(hours=random.randint(0, 48))).strftime('%Y-%m-%d %H:%M:%S'),
-            'type': 'alerts',
-            'severity': random.choice(severity_options),
-            'message': random.choice(messages),
-            'source': 'system_monitor'
-        })
-    
-    # Add system events
-    for i in range(8):
-        logs.append({
-            'id': i + 26,
-            'timestamp': (datetime.now() - timedelta(hours=random.randint(0, 72))).strftime('%Y-%m-%d %H:%M:%S'),
-            'type': 'system',
-            'severity': 'info',
-            'message': f'System {"startup" if i == 0 else "shutdown" if i == 1 else "check completed"}',
-            'source': 'system'
-        })
-    
-    # Apply filters
-    if log_type != 'all':
-        logs = [log for log in logs if log['type'] == log_type]
+    entries = query.limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
     
-    if severity != 'all':
-        logs = [log for log in logs if log['severity'] == severity]
+    response = jsonify([entry.to_dict() for entry in entries])
+    if has_more:
+        response.headers['X-Next-Cursor'] = page_cursor(entries[-1])
+    return response
+
+@logs_bp.route('/api/logs/export')
+def export_logs():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(FORMATS)}'}), 400
+    try:
+        days = parse_date_range(request.args.get('date_range', 'all'))
+    except ValueError:
+        return jsonify({'error': f'date_range must be all or 0-{MAX_DATE_RANGE_DAYS} days'}), 400
     
-    if search:
-        logs = [log for log in logs if search.lower() in log['message'].lower()]
+    query = filtered_logs(
+        log_type=request.args.get('type', 'all'),
+        severity=request.args.get('severity', 'all'),
+        days=days,
+        search=request.args.get('search', '')
+    ).with_entities(
+        LogEntry.id, LogEntry.timestamp, LogEntry.log_type,
+        LogEntry.severity, LogEntry.message, LogEntry.source
+    )
     
-    # Sort by timestamp (newest first)
-    logs.sort(key=lambda x: x['timestamp'], reverse=True)
+    def rows():
+        # yield_per keeps one batch of rows in memory, however long the export
+        for entry_id, timestamp, log_type, severity, message, source in query.yield_per(EXPORT_BATCH):
+            yield entry_id, timestamp.strftime('%Y-%m-%d %H:%M:%S'), log_type, severity, message, source
     
-    return jsonify(logs)
+    return export_response(EXPORT_FIELDS, rows(), export_format, 'logs',
+                           compress=request.args.get('gzip', type=int) == 1)
 
 @logs_bp.route('/api/logs/stats')
 def get_logs_stats():
-    stats = {
-        'info': 12,
-        'warning': 8,
-        'error': 3,
-        'critical': 1
-    }
+    log_type = request.args.get('type', 'all')
+    try:
+        days = parse_date_range(request.args.get('date_range', 'all'))
+    except ValueError:
+        return jsonify({'error': f'date_range must be all or 0-{MAX_DATE_RANGE_DAYS} days'}), 400
+    
+    query = db.session.query(
+        LogStatsHourly.log_type,
+        LogStatsHourly.severity,
+        func.sum(LogStatsHourly.count)
+    )
+    if days is not None:
+        # Whole hourly buckets: the oldest hour in range is counted in full
+        cutoff = (datetime.utcnow() - timedelta(days=days)).replace(minute=0, second=0, microsecond=0)
+        query = query.filter(LogStatsHourly.bucket >= cutoff)
+    if log_type != 'all':
+        query = query.filter(LogStatsHourly.log_type == log_type)
+    
+    stats = {'info': 0, 'warning': 0, 'error': 0, 'critical': 0}
+    by_type = {}
+    for row_type, row_severity, count in query.group_by(LogStatsHourly.log_type, LogStatsHourly.severity):
+        stats[row_severity] = stats.get(row_severity, 0) + count
+        by_type[row_type] = by_type.get(row_type, 0) + count
+    
+    stats['by_type'] = by_type
+    stats['total'] = sum(by_type.values())
     return jsonify(stats)
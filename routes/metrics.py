@@ -0,0 +1,8 @@
+from flask import Blueprint, Response
+from utils.instrumentation import instrumentation
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def prometheus_metrics():
+    return Response(instrumentation.render(), mimetype='text/plain; version=0.0.4')
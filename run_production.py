@@ -1,27 +1,144 @@
 #!/usr/bin/env python3
 """
 Production server for Network Monitoring Dashboard
+
+With gunicorn available, runs WORKERS processes (default: one per CPU) with
+THREADS threads each, plus a single collector process that does all psutil
+sampling. Without gunicorn (e.g. on Windows) it falls back to Flask's threaded
+server with an in-process collector.
 """
 
-from app import app
+import multiprocessing
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 
-if __name__ == '__main__':
-    # Production configuration
+SNAPSHOT_WAIT_SECONDS = 15
+
+
+def run_single_process(host, port):
+    from app import app
+    from models.database import init_database
+    
     app.config['DEBUG'] = False
     app.config['ENV'] = 'production'
+    init_database(app)
+    
+    app.run(
+        host=host,
+        port=port,
+        debug=False,
+        threaded=True
+    )
+
+
+def run_multi_process(host, port, workers, threads):
+    from gunicorn.app.base import BaseApplication
+    from utils.snapshot_channel import SnapshotReader, default_snapshot_path
+    
+    class ProductionServer(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+        
+        def load(self):
+            # Imported in each worker so no app state is shared across fork
+            from app import app
+            app.config['DEBUG'] = False
+            app.config['ENV'] = 'production'
+            return app
+    
+    # Workers must read the collector's snapshots, never sample on their own
+    os.environ['COLLECTOR_MODE'] = 'external'
+    snapshot_path = os.environ.get(
+        'SNAPSHOT_PATH',
+        default_snapshot_path(os.path.dirname(os.path.abspath(__file__)))
+    )
+    os.environ['SNAPSHOT_PATH'] = snapshot_path
+    if os.path.exists(snapshot_path):
+        os.remove(snapshot_path)
     
+    # Every process writes its instrumentation totals here so /metrics,
+    # whichever worker serves it, can report all of them
+    export_dir = os.environ.get('METRICS_EXPORT_DIR') or tempfile.mkdtemp(
+        prefix='network_monitor_metrics_', dir=os.path.dirname(snapshot_path)
+    )
+    os.environ['METRICS_EXPORT_DIR'] = export_dir
+    
+    # Every open /api/stream holds one of a worker's threads; past this many
+    # streams are refused with 503 and clients poll, so the remaining threads
+    # keep serving ordinary requests
+    if not os.environ.get('STREAM_MAX_CLIENTS'):
+        os.environ['STREAM_MAX_CLIENTS'] = str(max(1, threads // 2))
+    shutil.rmtree(export_dir, ignore_errors=True)
+    os.makedirs(export_dir)
+    
+    # A separate interpreter rather than a multiprocessing child: gunicorn
+    # forks workers from this process and they must not inherit its handle
+    collector = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'collector_service.py')]
+    )
+    master_pid = os.getpid()
+    
+    reader = SnapshotReader(snapshot_path)
+    deadline = time.monotonic() + SNAPSHOT_WAIT_SECONDS
+    while True:
+        try:
+            reader.latest()
+            break
+        except RuntimeError:
+            if collector.poll() is not None or time.monotonic() > deadline:
+                raise SystemExit('❌ Metrics collector failed to start')
+            time.sleep(0.1)
+    
+    try:
+        ProductionServer({
+            'bind': f'{host}:{port}',
+            'workers': workers,
+            # Threaded workers keep long-lived /api/stream connections from
+            # blocking other requests in the same process
+            'worker_class': 'gthread',
+            'threads': threads,
+            'timeout': 60,
+            'keepalive': 5,
+        }).run()
+    finally:
+        # Workers leave through here too when they exit
+        if os.getpid() == master_pid:
+            collector.terminate()
+            collector.wait(5)
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
+            shutil.rmtree(export_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
     # Use production server
     host = os.environ.get('HOST', '0.0.0.0')
     port = int(os.environ.get('PORT', 5000))
+    workers = int(os.environ.get('WORKERS', multiprocessing.cpu_count()))
+    threads = int(os.environ.get('THREADS', 16))
+    
+    try:
+        import gunicorn  # noqa: F401
+        multi_process = os.name != 'nt'
+    except ImportError:
+        multi_process = False
     
     print(f"🚀 Starting Network Monitoring Dashboard on http://{host}:{port}")
     print("📊 Dashboard is now running in production mode")
     print("🔒 Access from other devices on your network using your IP address")
     
-    app.run(
-        host=host,
-        port=port,
-        debug=False,
-        threaded=True
-    )
+    if multi_process:
+        print(f"⚙️  {workers} worker processes x {threads} threads, one shared metrics collector")
+        run_multi_process(host, port, workers, threads)
+    else:
+        print("⚠️  gunicorn not available: using the single-process threaded server")
+        run_single_process(host, port)
@@ -2,6 +2,13 @@
 let autoRefreshEnabled = true;
 let refreshInterval = 2000;
 let refreshTimer = null;
+let metricsStream = null;
+let streamRetryTimer = null;
+let activeAlertKey = null;
+let lastPerformanceTimestamp = 0;
+let polledMetrics = null;
+// How long to poll after the server refuses a stream before retrying it
+const STREAM_FALLBACK_MS = 60000;
 let charts = {};
 let alerts = [];
 let settings = {
@@ -367,15 +374,13 @@ function initializeCharts() {
 async function loadInitialData() {
     showLoading();
     try {
-        await Promise.all([
-            loadCPUMetrics(),
-            loadRAMMetrics(),
-            loadDiskMetrics(),
-            loadNetworkMetrics(),
-            loadSystemInfo(),
-            loadProcesses(),
-            loadAlerts()
-        ]);
+        // The metrics stream delivers the current snapshot as soon as it
+        // connects, so only history and persisted alerts are fetched here.
+        const requests = [loadPerformanceHistory(), loadAlerts()];
+        if (!window.EventSource) {
+            requests.push(refreshData());
+        }
+        await Promise.all(requests);
     } catch (error) {
         console.error('Error loading initial data:', error);
         showToast('Failed to load system metrics', 'error');
@@ -384,6 +389,24 @@ async function loadInitialData() {
     }
 }
 
+async function loadPerformanceHistory() {
+    try {
+        const response = await fetch('/api/historical-data?points=20');
+        const data = await response.json();
+        
+        data.cpu.forEach((point, index) => {
+            addPerformancePoint(
+                point.timestamp,
+                point.value,
+                data.ram[index].value,
+                data.disk[index].value
+            );
+        });
+    } catch (error) {
+        console.error('Error loading performance history:', error);
+    }
+}
+
 async function loadCPUMetrics() {
     try {
         const response = await fetch('/api/cpu');
@@ -476,8 +499,6 @@ function updateCPUChart(percentage) {
     if (cpuValue) {
         cpuValue.textContent = percentage.toFixed(1) + '%';
     }
-    
-    updatePerformanceHistory('cpu', percentage);
 }
 
 function updateCPUInfo(data) {
@@ -503,8 +524,6 @@ function updateRAMChart(percentage) {
     if (ramValue) {
         ramValue.textContent = percentage.toFixed(1) + '%';
     }
-    
-    updatePerformanceHistory('ram', percentage);
 }
 
 function updateRAMInfo(data) {
@@ -530,8 +549,6 @@ function updateDiskChart(percentage) {
     if (diskValue) {
         diskValue.textContent = percentage.toFixed(1) + '%';
     }
-    
-    updatePerformanceHistory('disk', percentage);
 }
 
 function updateDiskInfo(data) {
@@ -677,50 +694,124 @@ async function resolveAlert(alertId) {
     }
 }
 
-function updatePerformanceHistory(type, value) {
+function addPerformancePoint(timestamp, cpu, ram, disk) {
     if (!charts.performance) return;
     
-    const now = new Date();
-    const timeLabel = now.toLocaleTimeString();
+    // Resumed streams and the initial history load can overlap by a sample
+    if (timestamp <= lastPerformanceTimestamp) return;
+    lastPerformanceTimestamp = timestamp;
     
-    // Add new data point
-    if (charts.performance.data.labels.length === 0 || 
-        charts.performance.data.labels[charts.performance.data.labels.length - 1] !== timeLabel) {
-        
-        charts.performance.data.labels.push(timeLabel);
-        
-        // Add data to appropriate dataset
-        const datasetIndex = type === 'cpu' ? 0 : type === 'ram' ? 1 : 2;
-        charts.performance.data.datasets[datasetIndex].data.push(value);
-        
-        // Keep only last 20 data points
-        if (charts.performance.data.labels.length > 20) {
-            charts.performance.data.labels.shift();
-            charts.performance.data.datasets.forEach(dataset => {
-                dataset.data.shift();
-            });
+    charts.performance.data.labels.push(new Date(timestamp * 1000).toLocaleTimeString());
+    charts.performance.data.datasets[0].data.push(cpu);
+    charts.performance.data.datasets[1].data.push(ram);
+    charts.performance.data.datasets[2].data.push(disk);
+    
+    // Keep only last 20 data points
+    if (charts.performance.data.labels.length > 20) {
+        charts.performance.data.labels.shift();
+        charts.performance.data.datasets.forEach(dataset => {
+            dataset.data.shift();
+        });
+    }
+    
+    charts.performance.update();
+}
+
+function applySnapshot(data) {
+    updateCPUChart(data.cpu.percentage);
+    updateCPUInfo(data.cpu);
+    updateRAMChart(data.ram.percentage);
+    updateRAMInfo(data.ram);
+    updateDiskChart(data.disk.percentage);
+    updateDiskInfo(data.disk);
+    updateNetworkChart(data.network);
+    updateNetworkInfo(data.network);
+    updateSystemInfo(data.system_info);
+    updateProcessesTable(data.processes);
+    
+    addPerformancePoint(data.timestamp, data.cpu.percentage, data.ram.percentage, data.disk.percentage);
+    
+    // Open alerts ride along with every tick; only re-render when they change
+    if (data.alerts) {
+        const alertKey = data.alerts.map(alert => alert.id).join(',');
+        if (alertKey !== activeAlertKey) {
+            activeAlertKey = alertKey;
+            updateAlerts(data.alerts);
         }
-        
-        charts.performance.update();
+    }
+    
+    updateLastUpdateTime();
+}
+
+// ===== LIVE STREAM =====
+function startMetricsStream() {
+    if (metricsStream) return;
+    
+    // EventSource reconnects on its own and sends Last-Event-ID, so the
+    // server replays missed ticks instead of the page refetching history.
+    metricsStream = new EventSource('/api/stream');
+    metricsStream.addEventListener('metrics', (event) => {
+        applySnapshot(JSON.parse(event.data));
+    });
+    metricsStream.onerror = () => {
+        if (metricsStream.readyState === EventSource.CLOSED) {
+            // The server refused the stream (all stream slots busy), so
+            // poll for a while and then try streaming again
+            console.warn('Metrics stream unavailable, polling instead');
+            metricsStream = null;
+            startPolling();
+            streamRetryTimer = setTimeout(() => {
+                streamRetryTimer = null;
+                stopPolling();
+                startMetricsStream();
+            }, STREAM_FALLBACK_MS);
+            return;
+        }
+        console.warn('Metrics stream interrupted, reconnecting...');
+    };
+}
+
+function stopMetricsStream() {
+    if (metricsStream) {
+        metricsStream.close();
+        metricsStream = null;
     }
 }
 
 // ===== AUTO REFRESH =====
 function startAutoRefresh() {
-    if (autoRefreshEnabled) {
-        refreshTimer = setInterval(() => {
-            refreshData();
-        }, refreshInterval);
+    if (!autoRefreshEnabled) return;
+    
+    if (window.EventSource) {
+        startMetricsStream();
+    } else {
+        startPolling();
     }
 }
 
-function stopAutoRefresh() {
+function startPolling() {
+    if (refreshTimer) return;
+    refreshTimer = setInterval(() => {
+        refreshData();
+    }, refreshInterval);
+}
+
+function stopPolling() {
     if (refreshTimer) {
         clearInterval(refreshTimer);
         refreshTimer = null;
     }
 }
 
+function stopAutoRefresh() {
+    stopMetricsStream();
+    stopPolling();
+    if (streamRetryTimer) {
+        clearTimeout(streamRetryTimer);
+        streamRetryTimer = null;
+    }
+}
+
 function restartAutoRefresh() {
     stopAutoRefresh();
     startAutoRefresh();
@@ -751,17 +842,39 @@ function manualRefresh() {
     });
 }
 
+function mergeMetricsDelta(current, delta) {
+    // Deltas carry only changed fields; dicts are diffed one level deep and
+    // the keys they lost are listed per field in `removed`
+    const { removed = {}, ...changes } = delta;
+    const merged = { ...current, ...changes };
+    Object.keys(changes).forEach(field => {
+        const value = changes[field];
+        if (value && typeof value === 'object' && !Array.isArray(value) &&
+            current[field] && typeof current[field] === 'object' && !Array.isArray(current[field])) {
+            merged[field] = { ...current[field], ...value };
+        }
+    });
+    Object.keys(removed).forEach(field => {
+        if (merged[field] && typeof merged[field] === 'object') {
+            merged[field] = { ...merged[field] };
+            removed[field].forEach(key => delete merged[field][key]);
+        }
+    });
+    return merged;
+}
+
 async function refreshData() {
     try {
-        await Promise.all([
-            loadCPUMetrics(),
-            loadRAMMetrics(),
-            loadDiskMetrics(),
-            loadNetworkMetrics(),
-            loadSystemInfo(),
-            loadAlerts()
-        ]);
-        updateLastUpdateTime();
+        const url = polledMetrics ? `/api/all-metrics?since=${encodeURIComponent(polledMetrics.version)}` : '/api/all-metrics';
+        const response = await fetch(url);
+        const data = await response.json();
+        
+        const changed = !polledMetrics || data.version !== polledMetrics.version;
+        polledMetrics = data.since && polledMetrics ? mergeMetricsDelta(polledMetrics, data) : data;
+        if (changed) {
+            applySnapshot(polledMetrics);
+        }
+        await loadAlerts();
     } catch (error) {
         console.error('Error refreshing data:', error);
     }
@@ -0,0 +1,247 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from models.database import db, Alert, persist
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AlertRule:
+    alert_type: str
+    metric: str
+    threshold: float
+    label: str
+    severity: str = 'critical'
+    for_seconds: float = 0.0
+    hysteresis: float = 0.0
+
+    @property
+    def clear_threshold(self):
+        return self.threshold - self.hysteresis
+
+    def message(self, value):
+        return f"High {self.label} usage: {value:.1f}%"
+
+
+def default_rules(config):
+    for_seconds = float(config.get('ALERT_FOR_SECONDS', 30))
+    hysteresis = float(config.get('ALERT_HYSTERESIS', 5))
+    return [
+        AlertRule('cpu', 'cpu', float(config.get('CPU_THRESHOLD', 85)), 'CPU',
+                  for_seconds=for_seconds, hysteresis=hysteresis),
+        AlertRule('memory', 'ram', float(config.get('RAM_THRESHOLD', 90)), 'RAM',
+                  for_seconds=for_seconds, hysteresis=hysteresis),
+        AlertRule('disk', 'disk', float(config.get('DISK_THRESHOLD', 95)), 'disk',
+                  for_seconds=for_seconds, hysteresis=hysteresis)
+    ]
+
+
+class AlertEngine:
+    """Evaluates alert rules against every collector sample.
+
+    A rule fires once its metric has stayed above ``threshold`` for
+    ``for_seconds`` and clears only when it drops below
+    ``threshold - hysteresis``. Open alerts are kept in an in-memory index
+    keyed by alert type, so deduplication never touches the database; the
+    state changes from one evaluation go through the shared write queue
+    together and land in the same transaction. Detectors other than the
+    threshold rules (see utils.anomaly) open and clear alerts through
+    ``apply`` and share the same index.
+
+    Alerts can also be resolved by other processes (API workers in
+    multi-process mode), so every ``sync_interval`` seconds the open alerts
+    are checked by primary key and dropped if they were resolved elsewhere.
+    """
+
+    def __init__(self, rules=None, sync_interval=2.0):
+        self.rules = rules
+        self.sync_interval = sync_interval
+        self.app = None
+        self._last_sync = 0.0
+        self._open = {}
+        self._pending_since = {}
+        self._changes = []
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        if self.rules is None:
+            self.rules = app.config.get('ALERT_RULES') or default_rules(app.config)
+
+    @property
+    def active(self):
+        return self._loaded
+
+    def open_alerts(self):
+        with self._lock:
+            alerts = [dict(alert) for alert in self._open.values()]
+        alerts.sort(key=lambda alert: alert['created_at'], reverse=True)
+        return alerts
+
+    def evaluate(self, metrics, now=None):
+        now = time.time() if now is None else now
+        if not self._loaded:
+            self._load_open_alerts()
+        elif self._open and now - self._last_sync >= self.sync_interval:
+            self._sync_resolved()
+            self._last_sync = now
+
+        with self._lock:
+            for rule in self.rules or []:
+                value = metrics[rule.metric]['percentage']
+                is_open = rule.alert_type in self._open
+
+                if not is_open and value > rule.threshold:
+                    since = self._pending_since.setdefault(rule.alert_type, now)
+                    if now - since >= rule.for_seconds:
+                        self._fire(rule, value, now)
+                elif not is_open:
+                    self._pending_since.pop(rule.alert_type, None)
+                elif value < rule.clear_threshold:
+                    self._clear(rule.alert_type, now)
+
+        self.flush()
+        return self.open_alerts()
+
+    def apply(self, fired=(), cleared=(), now=None):
+        """Open and clear alerts decided outside the threshold rules.
+
+        ``fired`` holds ``(alert_type, message, severity)`` tuples and
+        ``cleared`` alert types; types already open (or already closed) are
+        skipped, so callers can report transitions without tracking them.
+        """
+        now = time.time() if now is None else now
+        if not self._loaded:
+            self._load_open_alerts()
+        with self._lock:
+            for alert_type, message, severity in fired:
+                if alert_type not in self._open:
+                    self._open_alert(alert_type, message, severity, now)
+            for alert_type in cleared:
+                if alert_type in self._open:
+                    self._clear(alert_type, now)
+        self.flush()
+
+    def open_types(self):
+        with self._lock:
+            return set(self._open)
+
+    def resolve(self, alert_id):
+        with self._lock:
+            for alert_type, alert in list(self._open.items()):
+                if alert['id'] == alert_id:
+                    self._clear(alert_type, time.time())
+                    return True
+        return False
+
+    def _fire(self, rule, value, now):
+        self._open_alert(rule.alert_type, rule.message(value), rule.severity, now)
+
+    def _open_alert(self, alert_type, message, severity, now):
+        alert = {
+            'id': None,
+            'type': alert_type,
+            'message': message,
+            'severity': severity,
+            'created_at': datetime.utcfromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+        }
+        self._open[alert_type] = alert
+        self._pending_since.pop(alert_type, None)
+        self._changes.append(('open', alert, now))
+
+    def _clear(self, alert_type, now):
+        alert = self._open.pop(alert_type)
+        self._pending_since.pop(alert_type, None)
+        self._changes.append(('resolve', alert, now))
+
+    def flush(self):
+        with self._lock:
+            changes, self._changes = self._changes, []
+        if not changes or self.app is None:
+            return
+
+        try:
+            created = persist(self._write_changes, changes).result()
+        except Exception:
+            logger.exception('Failed to write alert state changes')
+            with self._lock:
+                self._changes[:0] = changes
+            return
+        for alert, row_id in created:
+            alert['id'] = row_id
+
+    def _write_changes(self, changes):
+        created = []
+        resolved_ids = []
+        for action, alert, now in changes:
+            if action == 'open':
+                row = Alert(
+                    alert_type=alert['type'],
+                    message=alert['message'],
+                    severity=alert['severity'],
+                    created_at=datetime.utcfromtimestamp(now)
+                )
+                db.session.add(row)
+                created.append((alert, row))
+            elif alert['id'] is not None:
+                resolved_ids.append(alert['id'])
+            else:
+                # Opened and cleared before it was ever written
+                for index, (pending, row) in enumerate(created):
+                    if pending is alert:
+                        db.session.expunge(row)
+                        del created[index]
+                        break
+
+        if resolved_ids:
+            Alert.query.filter(Alert.id.in_(resolved_ids)).update(
+                {'resolved': True, 'resolved_at': datetime.utcnow()},
+                synchronize_session=False
+            )
+        # Assign primary keys now; they are only handed out once the batch commits
+        db.session.flush()
+        return [(alert, row.id) for alert, row in created]
+
+    def _sync_resolved(self):
+        with self._lock:
+            ids = [alert['id'] for alert in self._open.values() if alert['id'] is not None]
+        if not ids or self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                resolved = {row.id for row in Alert.query.filter(Alert.id.in_(ids), Alert.resolved.is_(True))}
+            except Exception:
+                logger.exception('Failed to sync resolved alerts')
+                return
+        with self._lock:
+            for alert_type, alert in list(self._open.items()):
+                if alert['id'] in resolved:
+                    del self._open[alert_type]
+
+    def _load_open_alerts(self):
+        if self.app is None:
+            return
+        with self.app.app_context():
+            try:
+                rows = Alert.query.filter_by(resolved=False).order_by(Alert.created_at).all()
+            except Exception:
+                logger.exception('Failed to load open alerts')
+                return
+            with self._lock:
+                for row in rows:
+                    self._open[row.alert_type] = {
+                        'id': row.id,
+                        'type': row.alert_type,
+                        'message': row.message,
+                        'severity': row.severity,
+                        'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S')
+                    }
+        self._loaded = True
+
+
+alert_engine = AlertEngine()
@@ -0,0 +1,302 @@
+import math
+
+import numpy as np
+
+from models.metrics_store import metrics_store, LOCAL_HOST, SERIES_COLUMNS
+from utils.alert_engine import alert_engine
+
+HOURS = 24
+
+
+class AnomalyDetector:
+    """Online anomaly detection for many (host, metric) series at once.
+
+    Every series gets a slot in a set of flat NumPy arrays, so each sample
+    costs O(1) and a whole round of samples (one per series) is a handful of
+    vectorized operations however many series there are. Per slot it keeps:
+
+    * an exponentially weighted mean and variance with time constant
+      ``window`` seconds, the "recent normal";
+    * the same per hour of day (UTC) with a time constant of
+      ``seasonal_days`` days of that hour, the "usual for this time of day".
+
+    A sample is anomalous when it is more than ``z_threshold`` standard
+    deviations from the recent normal and, once the hour-of-day baseline has
+    seen a full hour, from that baseline too, so a nightly batch job stops
+    looking unusual after a few nights. Standard deviations are floored at
+    ``min_std`` so a perfectly flat series does not alarm on noise.
+
+    A series opens once it has been anomalous for ``for_seconds`` and clears
+    when it is back within half the threshold. Anomalous samples are not
+    learned from, so neither a spike nor a long incident becomes the new
+    normal by itself; ``reset`` accepts the current level instead (the
+    watcher does so when an anomaly alert is resolved by hand).
+    """
+
+    def __init__(self, z_threshold=4.0, window=600.0, seasonal_days=7.0, min_std=2.0, for_seconds=30.0,
+                 capacity=64):
+        self.z_threshold = z_threshold
+        self.clear_threshold = z_threshold / 2
+        self.window = window
+        self.seasonal_window = seasonal_days * 3600
+        self.min_variance = min_std ** 2
+        self.for_seconds = for_seconds
+        self.keys = []
+        self._slots = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        def grow(array, fill):
+            grown = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+            grown[:len(array)] = array
+            return grown
+
+        if not hasattr(self, '_mean'):
+            self._last = np.full(0, np.nan)
+            self._mean = np.full(0, np.nan)
+            self._var = np.zeros(0)
+            self._seen = np.zeros(0)
+            self._since = np.full(0, np.nan)
+            self._open = np.zeros(0, dtype=bool)
+            self._season_mean = np.full((0, HOURS), np.nan)
+            self._season_var = np.zeros((0, HOURS))
+            self._season_seen = np.zeros((0, HOURS))
+        self._last = grow(self._last, np.nan)
+        self._mean = grow(self._mean, np.nan)
+        self._var = grow(self._var, 0.0)
+        self._seen = grow(self._seen, 0.0)
+        self._since = grow(self._since, np.nan)
+        self._open = grow(self._open, False)
+        self._season_mean = grow(self._season_mean, np.nan)
+        self._season_var = grow(self._season_var, 0.0)
+        self._season_seen = grow(self._season_seen, 0.0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def slots(self, keys):
+        """Slot indices for ``keys``, allocating slots for new ones."""
+        indices = []
+        for key in keys:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = len(self.keys)
+                if slot == len(self._mean):
+                    self._allocate(2 * len(self._mean))
+                self._slots[key] = slot
+                self.keys.append(key)
+            indices.append(slot)
+        return np.array(indices, dtype=np.intp)
+
+    def mark_open(self, keys):
+        """Treat ``keys`` as open, e.g. alerts still open from a previous run."""
+        self._open[self.slots(keys)] = True
+
+    def open_keys(self):
+        return [self.keys[slot] for slot in np.flatnonzero(self._open[:len(self.keys)])]
+
+    def reset(self, keys):
+        """Forget the recent baseline of ``keys``; it is relearned from the next samples."""
+        slots = self.slots(keys)
+        self._mean[slots] = np.nan
+        self._var[slots] = 0.0
+        self._seen[slots] = 0.0
+        self._since[slots] = np.nan
+        self._open[slots] = False
+
+    def update(self, slots, timestamps, values):
+        """Feed one sample to each of ``slots`` (which must be distinct).
+
+        Returns ``(opened, cleared, z, baseline)``: boolean masks over
+        ``slots`` plus each sample's z-score and recent mean.
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        timestamps = np.asarray(timestamps, dtype=float)
+        values = np.asarray(values, dtype=float)
+
+        last = self._last[slots]
+        dt = np.where(np.isnan(last), 0.0, np.clip(timestamps - last, 0.0, self.window))
+        self._last[slots] = np.fmax(last, timestamps)
+        valid = ~np.isnan(values)
+
+        mean, var = self._mean[slots], self._var[slots]
+        z = (values - mean) / np.sqrt(np.maximum(var, self.min_variance))
+        hours = (timestamps // 3600 % HOURS).astype(np.intp)
+        season_mean = self._season_mean[slots, hours]
+        season_ready = self._season_seen[slots, hours] >= 3600
+        season_z = (values - season_mean) / np.sqrt(np.maximum(self._season_var[slots, hours], self.min_variance))
+
+        ready = valid & (self._seen[slots] >= self.window)
+        anomalous = ready & (np.abs(z) > self.z_threshold) & (~season_ready | (np.abs(season_z) > self.z_threshold))
+        calm = ready & ((np.abs(z) <= self.clear_threshold) | (season_ready & (np.abs(season_z) <= self.clear_threshold)))
+
+        is_open = self._open[slots]
+        since = self._since[slots]
+        since = np.where(anomalous, np.where(np.isnan(since), timestamps, since), np.nan)
+        opened = anomalous & ~is_open & (timestamps - since >= self.for_seconds)
+        cleared = is_open & calm
+        self._since[slots] = since
+        self._open[slots] = (is_open | opened) & ~cleared
+
+        learn = valid & ~anomalous
+        self._mean[slots[learn]], self._var[slots[learn]] = _ewm_update(
+            mean[learn], var[learn], values[learn], -np.expm1(-dt[learn] / self.window)
+        )
+        self._seen[slots[learn]] += dt[learn]
+
+        # Until an hour has a baseline everything seen in it is learned,
+        # recurring spikes included, which is what makes them usual
+        learn = valid & ~(season_ready & (np.abs(season_z) > self.z_threshold))
+        slots, hours = slots[learn], hours[learn]
+        self._season_mean[slots, hours], self._season_var[slots, hours] = _ewm_update(
+            season_mean[learn], self._season_var[slots, hours], values[learn],
+            -np.expm1(-dt[learn] / self.seasonal_window)
+        )
+        self._season_seen[slots, hours] += dt[learn]
+        return opened, cleared, z, mean
+
+    def observe(self, series, timestamps, values):
+        """Feed a batch where ``series`` may repeat (e.g. many samples per host).
+
+        ``series`` is a sequence of slot arrays, one per sample, with the
+        matching ``values`` rows; samples are applied in order per slot. The
+        batch is cut into rounds holding at most one sample of each series,
+        and each round is one ``update``. Returns ``(slot, timestamp, value,
+        z, baseline, opened)`` for every series that opened or cleared.
+        """
+        rank = np.empty(len(series), dtype=np.intp)
+        counts = {}
+        for index, slots in enumerate(series):
+            key = int(slots[0])
+            rank[index] = counts.get(key, 0)
+            counts[key] = rank[index] + 1
+
+        order = np.argsort(rank, kind='stable')
+        bounds = np.searchsorted(rank[order], np.arange(1, max(counts.values(), default=0)))
+        width = len(series[0]) if len(series) else 0
+        all_slots = np.asarray(series, dtype=np.intp).reshape(-1, width)
+        all_times = np.repeat(np.asarray(timestamps, dtype=float)[:, None], width, axis=1)
+        all_values = np.asarray(values, dtype=float).reshape(-1, width)
+
+        transitions = []
+        for chunk in np.split(order, bounds):
+            slots, times, rows = all_slots[chunk].ravel(), all_times[chunk].ravel(), all_values[chunk].ravel()
+            opened, cleared, z, baseline = self.update(slots, times, rows)
+            for index in np.flatnonzero(opened | cleared):
+                transitions.append((int(slots[index]), times[index], rows[index], z[index], baseline[index],
+                                    bool(opened[index])))
+        return transitions
+
+
+def _ewm_update(mean, var, values, alpha):
+    # Incremental exponentially weighted mean and variance; an unset (NaN)
+    # mean starts at the first value with zero variance
+    first = np.isnan(mean)
+    diff = values - mean
+    increment = alpha * diff
+    return (np.where(first, values, mean + increment),
+            np.where(first, 0.0, (1 - alpha) * (var + diff * increment)))
+
+
+def anomaly_alert_type(host, metric):
+    return f'{metric}_anomaly' if host == LOCAL_HOST else f'{metric}_anomaly@{host}'
+
+
+def parse_anomaly_alert_type(alert_type):
+    metric, separator, host = alert_type.partition('_anomaly')
+    if not separator or (host and not host.startswith('@')):
+        return None
+    return host[1:], metric
+
+
+class AnomalyWatcher:
+    """Runs an AnomalyDetector over every sample written to the metrics store.
+
+    Called once per collector tick in the process that samples, it reads the
+    samples recorded since the last call (the local collector's and those
+    ingested from remote agents by any worker) in insertion order, so one
+    detector sees every series. Detections become Alert rows through the
+    alert engine: one open alert per host and metric, typed
+    ``<metric>_anomaly`` (``<metric>_anomaly@<host>`` for remote hosts).
+    """
+
+    def __init__(self, store, alert_engine, metrics=('cpu', 'ram', 'disk'), batch=10000, **detector_options):
+        self.store = store
+        self.alert_engine = alert_engine
+        self.metrics = tuple(metrics)
+        self.batch = batch
+        self.detector = AnomalyDetector(**detector_options)
+        self._last_id = None
+        self._columns = None
+
+    def init_app(self, app):
+        config = app.config
+        metrics = config.get('ANOMALY_METRICS', ','.join(self.metrics))
+        if isinstance(metrics, str):
+            metrics = [metric.strip() for metric in metrics.split(',') if metric.strip()]
+        unknown = set(metrics) - set(SERIES_COLUMNS)
+        if unknown:
+            raise ValueError(f'ANOMALY_METRICS: unknown metrics {", ".join(sorted(unknown))}')
+        self.metrics = tuple(metrics)
+        self.detector = AnomalyDetector(
+            z_threshold=float(config.get('ANOMALY_Z', self.detector.z_threshold)),
+            window=float(config.get('ANOMALY_WINDOW', self.detector.window)),
+            seasonal_days=float(config.get('ANOMALY_SEASONAL_DAYS', self.detector.seasonal_window / 3600)),
+            min_std=float(config.get('ANOMALY_MIN_STD', math.sqrt(self.detector.min_variance))),
+            for_seconds=float(config.get('ANOMALY_FOR_SECONDS', self.detector.for_seconds))
+        )
+        self._last_id = None
+
+    @property
+    def enabled(self):
+        return bool(self.metrics) and self.store.ready
+
+    def process(self, now=None):
+        if not self.enabled:
+            return []
+        if self._last_id is None:
+            # Start from the present; restored alerts clear once their series is calm
+            self._last_id = self.store.last_sample_id()
+            self._columns = [3 + SERIES_COLUMNS.index(metric) for metric in self.metrics]
+            restored = [key for key in map(parse_anomaly_alert_type, self.alert_engine.open_types())
+                        if key is not None and key[1] in self.metrics]
+            if restored:
+                self.detector.mark_open(restored)
+            return []
+
+        open_types = self.alert_engine.open_types()
+        resolved = [key for key in self.detector.open_keys() if anomaly_alert_type(*key) not in open_types]
+        if resolved:
+            self.detector.reset(resolved)
+
+        rows = self.store.samples_after(self._last_id, self.batch)
+        if not rows:
+            return []
+        self._last_id = rows[-1][0]
+
+        host_slots = {}
+        series = []
+        for row in rows:
+            slots = host_slots.get(row[1])
+            if slots is None:
+                slots = host_slots[row[1]] = self.detector.slots([(row[1], metric) for metric in self.metrics])
+            series.append(slots)
+        values = [[row[column] if row[column] is not None else math.nan for column in self._columns] for row in rows]
+        transitions = self.detector.observe(series, [row[2] for row in rows], values)
+
+        fired, cleared = [], []
+        for slot, timestamp, value, z, baseline, opened in transitions:
+            host, metric = self.detector.keys[slot]
+            alert_type = anomaly_alert_type(host, metric)
+            if opened:
+                where = f' on {host}' if host != LOCAL_HOST else ''
+                fired.append((alert_type, f'Unusual {metric}{where}: {value:.1f} vs recent {baseline:.1f} '
+                                          f'(z={z:+.1f})', 'warning'))
+            else:
+                cleared.append(alert_type)
+        if fired or cleared:
+            self.alert_engine.apply(fired, cleared, now)
+        return transitions
+
+
+anomaly_watcher = AnomalyWatcher(metrics_store, alert_engine)
@@ -0,0 +1,229 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from utils.instrumentation import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    sequence: int
+    timestamp: float
+    monotonic: float
+    cpu: dict
+    ram: dict
+    disk: dict
+    network: dict
+    devices: dict
+    processes: list
+    system_info: dict
+    alerts: list
+
+    @property
+    def age(self):
+        return max(0.0, time.monotonic() - self.monotonic)
+
+
+# What clients see of a snapshot, in the /api/stream and /api/all-metrics body
+PUBLIC_FIELDS = ('cpu', 'ram', 'disk', 'network', 'processes', 'system_info', 'alerts')
+
+
+def encode_snapshot(snapshot, version):
+    data = {field: getattr(snapshot, field) for field in PUBLIC_FIELDS}
+    data['timestamp'] = snapshot.timestamp
+    data['sequence'] = snapshot.sequence
+    data['version'] = version
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class MetricsCollector:
+    """Samples a SystemMonitor on a fixed interval in one background thread.
+
+    Each tick publishes a new MetricsSnapshot by swapping a single reference,
+    so readers never take a lock and never touch psutil themselves. Snapshots
+    are shared between requests and must be treated as read-only.
+
+    The last ``history_size`` snapshots are kept so push subscribers can wait
+    for the next tick and resume after a reconnect without missing samples.
+    Event ids are ``<epoch>-<sequence>``; the epoch changes on every process
+    start, so ids from a previous run are never mistaken for current ones.
+    """
+
+    def __init__(self, monitor, interval=1.0, store=None, alert_engine=None, publisher=None, history_size=120,
+                 anomalies=None):
+        self.monitor = monitor
+        self.interval = interval
+        self.store = store
+        self.alert_engine = alert_engine
+        self.anomalies = anomalies
+        self.publisher = publisher
+        self.epoch = int(time.time() * 1000)
+        self._snapshot = None
+        self._sequence = 0
+        self._history = deque(maxlen=history_size)
+        self._updated = threading.Condition()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            if interval:
+                self.interval = interval
+            self._stop_event.clear()
+            # The first reading has no previous cpu_percent() call to diff
+            # against, so block once for a short measured window.
+            self.sample(cpu_interval=0.1)
+            self._thread = threading.Thread(target=self._run, name='metrics-collector', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+
+    def latest(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.start()
+            snapshot = self._snapshot
+        return snapshot
+
+    def event_id(self, snapshot):
+        return f'{self.epoch}-{snapshot.sequence}'
+
+    def encoded(self, snapshot):
+        return encode_snapshot(snapshot, self.event_id(snapshot))
+
+    def wait_for_update(self, sequence, timeout=None):
+        with self._updated:
+            self._updated.wait_for(
+                lambda: self._snapshot is not None and self._snapshot.sequence > sequence,
+                timeout
+            )
+            snapshot = self._snapshot
+        if snapshot is None or snapshot.sequence <= sequence:
+            return None
+        return snapshot
+
+    def snapshots_since(self, event_id=None):
+        latest = self.latest()
+        sequence = self.parse_event_id(event_id)
+        if sequence is None or sequence > latest.sequence:
+            return [latest]
+        with self._updated:
+            history = list(self._history)
+        return [snapshot for snapshot in history if snapshot.sequence > sequence]
+
+    def snapshot_at(self, event_id):
+        sequence = self.parse_event_id(event_id)
+        if sequence is None:
+            return None
+        with self._updated:
+            for snapshot in reversed(self._history):
+                if snapshot.sequence == sequence:
+                    return snapshot
+        return None
+
+    def parse_event_id(self, event_id):
+        try:
+            epoch, sequence = (int(part) for part in event_id.split('-', 1))
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch:
+            return None
+        return sequence
+
+    def sample(self, cpu_interval=None):
+        monitor = self.monitor
+        cpu = monitor.get_cpu_usage(interval=cpu_interval)
+        ram = monitor.get_ram_usage()
+        disk = monitor.get_disk_usage()
+        network = monitor.get_network_activity()
+        devices = monitor.get_devices()
+        processes = monitor.get_processes()
+        system_info = monitor.get_system_info()
+        timestamp = time.time()
+
+        if self.alert_engine is not None:
+            try:
+                alerts = self.alert_engine.evaluate({'cpu': cpu, 'ram': ram, 'disk': disk}, timestamp)
+            except Exception:
+                logger.exception('Alert evaluation failed')
+                alerts = self.alert_engine.open_alerts()
+        else:
+            alerts = monitor.check_alerts(cpu, ram, disk)
+
+        self._sequence += 1
+        snapshot = MetricsSnapshot(
+            sequence=self._sequence,
+            timestamp=timestamp,
+            monotonic=time.monotonic(),
+            cpu=cpu,
+            ram=ram,
+            disk=disk,
+            network=network,
+            devices=devices,
+            processes=processes,
+            system_info=system_info,
+            alerts=alerts
+        )
+        with self._updated:
+            self._history.append(snapshot)
+            self._snapshot = snapshot
+            self._updated.notify_all()
+
+        if self.publisher is not None:
+            try:
+                self.publisher.publish(snapshot, self.epoch, self.interval)
+            except Exception:
+                logger.exception('Failed to publish metrics snapshot')
+
+        if self.store is not None and self.store.ready:
+            try:
+                self.store.append(snapshot)
+            except Exception:
+                logger.exception('Failed to persist metrics sample')
+
+        if self.anomalies is not None:
+            # Reads back what was just stored, plus anything agents ingested
+            try:
+                self.anomalies.process(timestamp)
+            except Exception:
+                logger.exception('Anomaly detection failed')
+        return snapshot
+
+    def _run(self):
+        next_tick = time.monotonic() + self.interval
+        while not self._stop_event.wait(max(0.0, next_tick - time.monotonic())):
+            started = time.monotonic()
+            instrumentation.observe('collector_tick_lag_seconds', max(0.0, started - next_tick))
+            try:
+                self.sample()
+            except Exception:
+                instrumentation.inc('collector_tick_failures_total')
+                logger.exception('Metrics collector tick failed')
+            instrumentation.observe('collector_tick_duration_seconds', time.monotonic() - started)
+
+            next_tick += self.interval
+            now = time.monotonic()
+            if next_tick < now:
+                # Fell behind (slow tick or suspended host): skip the missed ticks
+                instrumentation.inc('collector_ticks_skipped_total', int((now - next_tick) // self.interval) + 1)
+                next_tick = now + self.interval
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps.
+
+    ``x`` must be sorted. The first and last points are always kept; the rest
+    are split into ``threshold - 2`` buckets of (almost) equal size, and from
+    each bucket the point forming the largest triangle with the point kept
+    from the previous bucket and the average of the next bucket is chosen.
+    Peaks and dips survive, unlike with plain averaging or striding.
+
+    ``y`` may be 2-D (one column per series sharing ``x``); the result then
+    has one column of indices per series, all computed in the same pass.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    flat = y.ndim == 1
+    if flat:
+        y = y[:, None]
+    count, columns = y.shape
+    if threshold >= count or threshold < 3:
+        selected = np.repeat(np.arange(count)[:, None], columns, axis=1)
+        return selected[:, 0] if flat else selected
+
+    # Relative timestamps keep the expanded area terms below precise
+    x = x - x[0]
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+    # Bucket averages from prefix sums; the last bucket looks ahead to the last point
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate((np.zeros((1, columns)), np.nancumsum(y, axis=0)))
+    sizes = ends - starts
+    next_x = np.append(((sum_x[ends] - sum_x[starts]) / sizes)[1:], x[-1])
+    next_y = np.nan_to_num(np.vstack((((sum_y[ends] - sum_y[starts]) / sizes[:, None])[1:], y[-1:])))
+
+    # Twice the triangle area for candidate j given the previously kept point
+    # (px, py) is |px * a[j] + py * b[j] + c[j]|, so the per-point terms are
+    # computed once for the whole series and each bucket only needs one
+    # multiply-add and an argmax. Buckets are padded to one row each; padding
+    # and missing values get zero area. Layout: (bucket, series, candidate).
+    width = int(sizes.max())
+    index = starts[:, None] + np.arange(width)
+    valid = index < ends[:, None]
+    index = np.where(valid, index, 0)
+    bucket_x = x[index][:, None, :]
+    bucket_y = y[index].transpose(0, 2, 1)
+    valid = valid[:, None, :] & ~np.isnan(bucket_y)
+    nx, ny = next_x[:, None, None], next_y[:, :, None]
+    a = np.where(valid, bucket_y - ny, 0.0)
+    b = np.where(valid, nx - bucket_x, 0.0)
+    c = np.where(valid, bucket_x * ny - nx * bucket_y, 0.0)
+
+    known_y = np.nan_to_num(y)
+    series = np.arange(columns)
+    selected = np.empty((threshold, columns), dtype=np.intp)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = selected[0]
+    for bucket in range(threshold - 2):
+        px = x[previous][:, None]
+        py = known_y[previous, series][:, None]
+        previous = starts[bucket] + np.abs(px * a[bucket] + py * b[bucket] + c[bucket]).argmax(axis=1)
+        selected[bucket + 1] = previous
+    return selected[:, 0] if flat else selected
+
+
+def downsample(rows, threshold, series):
+    """Pick up to ``threshold`` of ``rows`` per series with LTTB.
+
+    ``rows`` are tuples whose first element is the timestamp; ``series`` maps
+    a name to the column index it plots, or to a tuple of indices whose sum
+    decides which rows are kept (e.g. upload + download). Returns
+    ``{name: [rows]}`` with the original row tuples, untouched.
+    """
+    if len(rows) <= threshold:
+        return {name: rows for name in series}
+    data = np.array(rows, dtype=float)
+    values = np.column_stack([
+        np.nansum(data[:, list(columns)], axis=1) if isinstance(columns, tuple) else data[:, columns]
+        for columns in series.values()
+    ])
+    selected = lttb_indices(data[:, 0], values, threshold).T.tolist()
+    return {name: [rows[index] for index in indices] for name, indices in zip(series, selected)}
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import re
+import zlib
+from urllib.parse import quote
+
+from flask import Response, stream_with_context
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Rows are written out in chunks of roughly this many bytes
+CHUNK_BYTES = 64 * 1024
+
+
+def csv_chunks(fields, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(fields, rows):
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(fields, row)), separators=(',', ':'), default=str)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_BYTES:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+            size = 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def content_disposition(filename):
+    """An attachment header for ``filename``, which may contain user input.
+
+    The plain ``filename`` keeps only characters that are safe unquoted in
+    any client; the full name follows RFC 5987-encoded for those that read it.
+    """
+    fallback = re.sub(r'[^A-Za-z0-9._-]', '_', filename)
+    return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def export_response(fields, rows, export_format, filename, compress=False):
+    """Stream ``rows`` (any iterable of tuples matching ``fields``) as a download.
+
+    Nothing is materialized: rows are pulled from the iterable, typically a
+    database cursor, as the client reads, so memory use does not depend on the
+    size of the export. ``compress`` gzips on the fly into a ``.gz`` file.
+    """
+    mimetype, extension = FORMATS[export_format]
+    chunks = csv_chunks(fields, rows) if export_format == 'csv' else ndjson_chunks(fields, rows)
+    filename = f'{filename}.{extension}'
+    if compress:
+        chunks = gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = content_disposition(filename)
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
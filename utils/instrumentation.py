@@ -0,0 +1,271 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CALL_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+Family = namedtuple('Family', 'kind help labelnames buckets')
+
+FAMILIES = {
+    'http_request_duration_seconds': Family(
+        'histogram', 'Time spent handling a request.',
+        ('blueprint', 'endpoint', 'method', 'status'), REQUEST_BUCKETS),
+    'collector_tick_duration_seconds': Family(
+        'histogram', 'Time taken to take and publish one metrics snapshot.', (), CALL_BUCKETS),
+    'collector_tick_lag_seconds': Family(
+        'histogram', 'How late collector ticks started relative to their schedule.', (), CALL_BUCKETS),
+    'collector_ticks_skipped_total': Family(
+        'counter', 'Collector ticks skipped because sampling fell behind.', (), None),
+    'collector_tick_failures_total': Family(
+        'counter', 'Collector ticks that raised.', (), None),
+    'system_monitor_call_duration_seconds': Family(
+        'histogram', 'Time spent in each SystemMonitor method.', ('method',), CALL_BUCKETS),
+    'db_query_duration_seconds': Family(
+        'histogram', 'Database statement and query durations.', ('database', 'operation'), CALL_BUCKETS),
+    'password_check_duration_seconds': Family(
+        'histogram', 'Time spent verifying one password hash.', (), REQUEST_BUCKETS),
+    'password_checks_rejected_total': Family(
+        'counter', 'Logins turned away because the password pool was saturated.', (), None),
+    'write_behind_flush_duration_seconds': Family(
+        'histogram', 'Time taken to write one write-behind batch.', ('queue',), CALL_BUCKETS),
+    'write_behind_items_total': Family(
+        'counter', 'Items written by each write-behind queue.', ('queue',), None),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _add_totals(totals, shard):
+    for key, value in list(shard.items()):
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _process_alive(pid):
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return False
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Instrumentation:
+    """Counters and fixed-bucket histograms in the Prometheus text format.
+
+    Each thread records into its own shard, so recording a value never takes
+    a lock; a scrape sums the shards. Shards of threads that have exited
+    are folded into one retired shard, so one-thread-per-connection servers
+    do not accumulate them. In multi-process deployments every
+    process also writes its totals to ``METRICS_EXPORT_DIR`` once per
+    ``export_interval`` and ``/metrics`` merges them, so whichever worker
+    answers the scrape reports the whole server, collector included. Files
+    left by processes that have exited are removed.
+    """
+
+    def __init__(self, families=None, export_interval=1.0):
+        self.families = dict(FAMILIES if families is None else families)
+        self.export_interval = export_interval
+        self.export_dir = None
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._shards_lock = threading.Lock()
+        self._exporter = None
+
+    def init_app(self, app):
+        app.before_request(self._start_request)
+        app.after_request(self._record_status)
+        # Teardown also runs for unhandled exceptions, which skip after_request
+        app.teardown_request(self._finish_request)
+
+        export_dir = app.config.get('METRICS_EXPORT_DIR')
+        if export_dir:
+            self.export_dir = export_dir
+            os.makedirs(export_dir, exist_ok=True)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._retire_dead_shards()
+                self._shards.append((threading.current_thread(), shard))
+            self._ensure_exporter()
+        return shard
+
+    def observe(self, name, value, labels=()):
+        shard = self._shard()
+        key = (name, labels)
+        cells = shard.get(key)
+        buckets = self.families[name].buckets
+        if cells is None:
+            # One count per bucket, then +Inf, then the sum
+            cells = shard[key] = [0] * (len(buckets) + 1) + [0.0]
+        cells[bisect_left(buckets, value)] += 1
+        cells[-1] += value
+
+    def inc(self, name, amount=1, labels=()):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def timed(self, name, *labels):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start, labels)
+            return wrapper
+        return decorator
+
+    def _start_request(self):
+        from flask import request
+        request.environ['instrumentation.start'] = time.perf_counter()
+
+    def _record_status(self, response):
+        from flask import request
+        request.environ['instrumentation.status'] = response.status_code
+        return response
+
+    def _finish_request(self, error=None):
+        from flask import request
+        start = request.environ.pop('instrumentation.start', None)
+        if start is not None:
+            endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+            status = request.environ.get('instrumentation.status', 500 if error is not None else 200)
+            self.observe('http_request_duration_seconds', time.perf_counter() - start, (
+                request.blueprint or '', endpoint, request.method, str(status)
+            ))
+
+    def _retire_dead_shards(self):
+        # Caller holds _shards_lock. A finished thread never writes its
+        # shard again, so it can be merged without racing the owner.
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+            else:
+                _add_totals(self._retired, shard)
+        self._shards = live
+
+    def collect(self):
+        """Totals for this process: {(name, labels): value or cells}."""
+        with self._shards_lock:
+            self._retire_dead_shards()
+            totals = _add_totals({}, self._retired)
+            shards = [shard for thread, shard in self._shards]
+        for shard in shards:
+            _add_totals(totals, shard)
+        return totals
+
+    def _ensure_exporter(self):
+        if self.export_dir is None or (self._exporter is not None and self._exporter[0] == os.getpid()):
+            return
+        thread = threading.Thread(target=self._export_loop, name='metrics-exporter', daemon=True)
+        # Remember the owning pid: threads do not survive a fork
+        self._exporter = (os.getpid(), thread)
+        thread.start()
+
+    def _export_loop(self):
+        while True:
+            time.sleep(self.export_interval)
+            try:
+                self.export()
+            except Exception:
+                logger.exception('Failed to export instrumentation totals')
+
+    def export(self):
+        path = os.path.join(self.export_dir, f'{os.getpid()}.json')
+        records = [[name, list(labels), value] for (name, labels), value in self.collect().items()]
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as output:
+            json.dump(records, output)
+        os.replace(temporary, path)
+
+    def _merged(self):
+        totals = self.collect()
+        if not self.export_dir:
+            return totals
+        own = f'{os.getpid()}.json'
+        for filename in os.listdir(self.export_dir):
+            if not filename.endswith('.json') or filename == own:
+                continue
+            if not _process_alive(filename[:-len('.json')]):
+                # Exited or restarted worker: its totals are gone with it
+                try:
+                    os.remove(os.path.join(self.export_dir, filename))
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(os.path.join(self.export_dir, filename)) as exported:
+                    records = json.load(exported)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in records:
+                if name not in self.families:
+                    continue
+                key = (name, tuple(labels))
+                current = totals.get(key)
+                if current is None:
+                    totals[key] = value
+                elif isinstance(value, list):
+                    totals[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    totals[key] = current + value
+        return totals
+
+    def render(self):
+        totals = self._merged()
+        lines = []
+        for name, family in self.families.items():
+            series = sorted((labels, value) for (series_name, labels), value in totals.items() if series_name == name)
+            lines.append(f'# HELP {name} {family.help}')
+            lines.append(f'# TYPE {name} {family.kind}')
+            for labels, value in series:
+                if family.kind == 'counter':
+                    lines.append(f'{name}{_format_labels(family.labelnames, labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(family.buckets + ('+Inf',), value[:-1]):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f'{name}_bucket{_format_labels(family.labelnames, labels, le)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(family.labelnames, labels)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(family.labelnames, labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+instrumentation = Instrumentation()
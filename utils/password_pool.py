@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+
+from utils.instrumentation import instrumentation
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when a password check cannot start soon enough."""
+
+
+class PasswordPool:
+    """Runs bcrypt password checks on a small, bounded thread pool.
+
+    bcrypt releases the GIL while hashing, so ``workers`` threads keep that
+    many cores busy. A check is only admitted while fewer than
+    ``queue_limit`` are waiting or running and the projected wait (checks
+    ahead of it per worker times the moving average check time) is below
+    ``max_wait``; otherwise ``check`` raises PasswordPoolBusy straight away,
+    so a burst of logins is shed in microseconds instead of tying up every
+    server thread until it times out.
+    """
+
+    def __init__(self, workers=None, queue_limit=None, max_wait=1.0, timeout=5.0):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self._executor = None
+        self._owner_pid = None
+        self._pending = 0
+        self._average = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = int(app.config.get('LOGIN_WORKERS') or os.cpu_count() or 1)
+        self.queue_limit = int(app.config.get('LOGIN_QUEUE_LIMIT') or self.workers * 8)
+        self.max_wait = float(app.config.get('LOGIN_MAX_WAIT', self.max_wait))
+        self.timeout = float(app.config.get('LOGIN_TIMEOUT', self.timeout))
+
+    def _admit(self):
+        with self._lock:
+            # Worker threads do not survive a fork, so each process builds its own pool
+            if self._owner_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self._workers(), thread_name_prefix='password-check')
+                self._owner_pid = os.getpid()
+                self._pending = 0
+            queue_limit = self.queue_limit or self._workers() * 8
+            if not self._average:
+                # Nothing to project from until the first check finishes
+                queue_limit = self._workers()
+            projected_wait = self._pending // self._workers() * self._average
+            if self._pending >= queue_limit or projected_wait > self.max_wait:
+                return None
+            self._pending += 1
+            return self._executor
+
+    def _workers(self):
+        return self.workers or os.cpu_count() or 1
+
+    def _finished(self, duration):
+        with self._lock:
+            self._pending -= 1
+            if duration is not None:
+                self._average = duration if not self._average else 0.8 * self._average + 0.2 * duration
+
+    def check(self, password, password_hash):
+        executor = self._admit()
+        if executor is None:
+            instrumentation.inc('password_checks_rejected_total')
+            raise PasswordPoolBusy()
+        try:
+            future = executor.submit(self._run, password, password_hash)
+        except BaseException:
+            self._finished(None)
+            raise
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                self._finished(None)
+            instrumentation.inc('password_checks_rejected_total')
+            raise PasswordPoolBusy()
+
+    def _run(self, password, password_hash):
+        start = time.perf_counter()
+        duration = None
+        try:
+            result = bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+            duration = time.perf_counter() - start
+            instrumentation.observe('password_check_duration_seconds', duration)
+            return result
+        finally:
+            self._finished(duration)
+
+
+password_pool = PasswordPool()
@@ -0,0 +1,94 @@
+import heapq
+import threading
+
+import psutil
+
+
+class ProcessTracker:
+    """Keeps psutil.Process handles alive between scans.
+
+    psutil measures ``cpu_percent()`` against the previous call on the same
+    Process object, so reusing handles gives real per-interval CPU usage. A
+    handle is only trusted while its (pid, create_time) identity still holds.
+    Checking that costs a /proc read per process, so the scan reads CPU times
+    alone and ``Process.is_running()`` is asked only of the top candidates
+    picked with a bounded heap; a reused pid among them gets a fresh handle
+    and is left out until its next reading. Pids that disappeared since the
+    last scan are evicted.
+    """
+
+    def __init__(self, limit=10):
+        self.limit = limit
+        self._processes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._processes)
+
+    def top(self, limit=None):
+        limit = limit or self.limit
+        with self._lock:
+            samples = self._sample_cpu()
+            results = []
+            for cpu_percent, pid in heapq.nlargest(limit * 2, samples):
+                row = self._describe(pid, cpu_percent)
+                if row is not None:
+                    results.append(row)
+                    if len(results) == limit:
+                        break
+            return results
+
+    def _sample_cpu(self):
+        current_pids = set(psutil.pids())
+        cached = self._processes
+
+        for pid in cached.keys() - current_pids:
+            del cached[pid]
+
+        samples = []
+        for pid in current_pids:
+            process = cached.get(pid)
+            if process is None:
+                if self._track(pid) is not None:
+                    samples.append((0.0, pid))
+                continue
+            try:
+                samples.append((process.cpu_percent(None), pid))
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                cached.pop(pid, None)
+            except psutil.AccessDenied:
+                pass
+        return samples
+
+    def _describe(self, pid, cpu_percent):
+        process = self._processes[pid]
+        if not process.is_running():
+            # The pid was reused since the last scan, so the reading compared
+            # two different processes
+            self._track(pid)
+            return None
+        try:
+            with process.oneshot():
+                return {
+                    'pid': pid,
+                    'name': process.name(),
+                    'cpu_percent': cpu_percent,
+                    'memory_percent': process.memory_percent(),
+                    'status': process.status()
+                }
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self._processes.pop(pid, None)
+        except psutil.AccessDenied:
+            pass
+        return None
+
+    def _track(self, pid):
+        try:
+            process = psutil.Process(pid)
+            # Prime the CPU counter; the first real reading comes next scan
+            process.cpu_percent(None)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+            self._processes.pop(pid, None)
+            return None
+        self._processes[pid] = process
+        return process
@@ -0,0 +1,84 @@
+import math
+import threading
+import time
+
+COUNTER_WRAP = 2 ** 32
+# How close to 2**32 a counter must have been for a decrease to be a wrap
+WRAP_MARGIN = 2 ** 30
+
+
+class RateEngine:
+    """Turns monotonically increasing counters into per-second rates.
+
+    Every counter keeps its previous reading and monotonic timestamp. Rates are
+    exposed both as the instantaneous value over the last interval and as
+    EWMA-smoothed values whose time constants are given by ``windows``.
+    """
+
+    WINDOWS = {'1s': 1.0, '10s': 10.0, '60s': 60.0}
+
+    def __init__(self, windows=None, clock=time.monotonic):
+        self.windows = dict(windows or self.WINDOWS)
+        self.clock = clock
+        self._previous = {}
+        self._rates = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, value, timestamp=None):
+        now = self.clock() if timestamp is None else timestamp
+
+        with self._lock:
+            previous = self._previous.get(key)
+            self._previous[key] = (value, now)
+            if previous is None:
+                return self._rates.get(key)
+
+            previous_value, previous_time = previous
+            elapsed = now - previous_time
+            if elapsed <= 0:
+                return self._rates.get(key)
+
+            delta = value - previous_value
+            if delta < 0:
+                delta = self._unwrap(previous_value, value)
+                if delta is None:
+                    # Counter reset (NIC re-plugged, driver reload, stats
+                    # cleared): keep the last rates and restart from here.
+                    return self._rates.get(key)
+
+            rate = delta / elapsed
+            smoothed = self._rates.get(key)
+            if smoothed is None:
+                smoothed = {name: rate for name in self.windows}
+            else:
+                smoothed = dict(smoothed)
+                for name, tau in self.windows.items():
+                    alpha = 1.0 - math.exp(-elapsed / tau)
+                    smoothed[name] += alpha * (rate - smoothed[name])
+            smoothed['instant'] = rate
+            self._rates[key] = smoothed
+            return smoothed
+
+    def rate(self, key, window='1s'):
+        rates = self._rates.get(key)
+        if rates is None:
+            return 0.0
+        return rates[window]
+
+    def rates(self, key):
+        return self._rates.get(key) or dict.fromkeys(list(self.windows) + ['instant'], 0.0)
+
+    def forget(self, key):
+        with self._lock:
+            self._previous.pop(key, None)
+            self._rates.pop(key, None)
+
+    @staticmethod
+    def _unwrap(previous, current):
+        # Only 32-bit counters wrap in practice, and only from near the top
+        # of their range back to near zero. Any other decrease, including a
+        # 64-bit counter that resets while still below 2**32, is a reset.
+        delta = COUNTER_WRAP - previous + current
+        if COUNTER_WRAP - WRAP_MARGIN <= previous < COUNTER_WRAP and delta <= WRAP_MARGIN:
+            return delta
+        return None
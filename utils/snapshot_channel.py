@@ -0,0 +1,270 @@
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+
+from utils.collector import MetricsSnapshot, encode_snapshot
+
+MAGIC = b'NMSS'
+LAYOUT_VERSION = 2
+DEFAULT_SLOT_CAPACITY = 1024 * 1024
+# Readers sleep until just before the next snapshot is due, then check often
+WAKE_MARGIN = 0.02
+FINE_POLL_INTERVAL = 0.002
+
+# Segment layout (little endian):
+#   header: magic, layout version, slot capacity, active slot
+#   slot 0, slot 1: sequence (odd while being written), payload length, payload
+# The payload is the snapshot as clients see it (encode_snapshot), a newline,
+# then JSON with what only readers need: epoch, collector interval, devices.
+HEADER = struct.Struct('<4sIII')
+SLOT_HEADER = struct.Struct('<QI4x')
+ACTIVE_SLOT_OFFSET = 12
+
+
+def default_snapshot_path(root=None):
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else (root or tempfile.gettempdir())
+    return os.path.join(directory, 'network_monitor_snapshot')
+
+
+def _slot_offset(slot, capacity):
+    return HEADER.size + slot * (SLOT_HEADER.size + capacity)
+
+
+def _segment_size(capacity):
+    return _slot_offset(2, capacity)
+
+
+class SnapshotPublisher:
+    """Writes collector snapshots into a shared, memory-mapped segment.
+
+    The segment holds two fixed-size slots. Each publish writes the inactive
+    slot under its own sequence counter (odd while the write is in progress),
+    then flips the active-slot index, so readers in other processes almost
+    never see a write in progress and never have to wait for one.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_SLOT_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            os.ftruncate(fd, _segment_size(capacity))
+            self._map = mmap.mmap(fd, _segment_size(capacity))
+        finally:
+            os.close(fd)
+
+        # Invalidate whatever a previous run left behind, but keep the slot
+        # sequences moving forward so existing readers notice the change.
+        for slot in (0, 1):
+            offset = _slot_offset(slot, capacity)
+            sequence, _ = SLOT_HEADER.unpack_from(self._map, offset)
+            SLOT_HEADER.pack_into(self._map, offset, sequence + (sequence % 2) + 2, 0)
+        HEADER.pack_into(self._map, 0, MAGIC, LAYOUT_VERSION, capacity, 0)
+
+    def publish(self, snapshot, epoch, interval):
+        private = {'epoch': epoch, 'interval': interval, 'devices': snapshot.devices}
+        data = (encode_snapshot(snapshot, f'{epoch}-{snapshot.sequence}') + b'\n'
+                + json.dumps(private, separators=(',', ':')).encode())
+        if len(data) > self.capacity:
+            raise ValueError(f'Snapshot of {len(data)} bytes exceeds the {self.capacity} byte slot')
+
+        active = struct.unpack_from('<I', self._map, ACTIVE_SLOT_OFFSET)[0]
+        slot = 1 - active
+        offset = _slot_offset(slot, self.capacity)
+        sequence, _ = SLOT_HEADER.unpack_from(self._map, offset)
+
+        SLOT_HEADER.pack_into(self._map, offset, sequence + 1, 0)
+        start = offset + SLOT_HEADER.size
+        self._map[start:start + len(data)] = data
+        SLOT_HEADER.pack_into(self._map, offset, sequence + 2, len(data))
+        struct.pack_into('<I', self._map, ACTIVE_SLOT_OFFSET, slot)
+
+    def close(self):
+        self._map.close()
+
+
+class SnapshotReader:
+    """Collector stand-in for worker processes that must not sample psutil.
+
+    Exposes the same read interface as MetricsCollector but takes snapshots
+    from the segment written by the collector process. Checking for a new
+    snapshot reads two integers from shared memory: no syscalls, no locks.
+    A snapshot is copied and decoded once per process per tick, and the
+    decoded object is shared by every request until the next tick; its
+    client-facing JSON is served straight from the slot bytes.
+
+    Stream subscribers wait on a condition. While any are waiting, one
+    watcher thread per process sleeps until the next snapshot is due and
+    then checks the segment every few milliseconds until it lands, so a
+    push follows the collector's publish within a couple of milliseconds.
+    """
+
+    def __init__(self, path, poll_interval=0.1, retries=100, history_size=16):
+        self.path = path
+        # How often a late or stopped collector is checked for
+        self.poll_interval = poll_interval
+        self.retries = retries
+        self.epoch = None
+        self.interval = None
+        self._map = None
+        self._capacity = None
+        self._snapshot = None
+        self._encoded = (None, None)
+        self._version = None
+        self._recent = deque(maxlen=history_size)
+        self._updated = threading.Condition()
+        self._waiters = 0
+        self._watcher = None
+
+    @property
+    def running(self):
+        return self._snapshot is not None
+
+    def start(self, interval=None):
+        pass
+
+    def _open(self):
+        with open(self.path, 'rb') as segment:
+            mapped = mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, capacity, _ = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            mapped.close()
+            raise RuntimeError(f'{self.path} is not a metrics snapshot segment (layout {version})')
+        self._map = mapped
+        self._capacity = capacity
+
+    def latest(self):
+        if self._map is None:
+            try:
+                self._open()
+            except FileNotFoundError:
+                raise RuntimeError(f'No metrics snapshot segment at {self.path}; is the collector process running?')
+
+        mapped = self._map
+        for _ in range(self.retries):
+            slot = struct.unpack_from('<I', mapped, ACTIVE_SLOT_OFFSET)[0]
+            offset = _slot_offset(slot, self._capacity)
+            sequence, length = SLOT_HEADER.unpack_from(mapped, offset)
+            if (slot, sequence) == self._version:
+                return self._snapshot
+            if sequence % 2:
+                # The writer lapped us and is rewriting this slot
+                continue
+            if not length:
+                break
+
+            start = offset + SLOT_HEADER.size
+            data = mapped[start:start + length]
+            # The slot must be unchanged and still the published one; a slot
+            # written after we read the index but not yet flipped to is skipped
+            if (SLOT_HEADER.unpack_from(mapped, offset)[0] != sequence
+                    or struct.unpack_from('<I', mapped, ACTIVE_SLOT_OFFSET)[0] != slot):
+                continue
+            self._decode(data)
+            self._version = (slot, sequence)
+            return self._snapshot
+
+        if self._snapshot is None:
+            raise RuntimeError(f'No metrics snapshot published at {self.path} yet')
+        return self._snapshot
+
+    def _decode(self, data):
+        public, _, private = data.partition(b'\n')
+        payload = json.loads(public)
+        extra = json.loads(private)
+        self.epoch = extra['epoch']
+        self.interval = extra['interval']
+        del payload['version']
+        payload['devices'] = extra['devices']
+        # Monotonic clocks are per process; rebase the age onto this one
+        payload['monotonic'] = time.monotonic() - max(0.0, time.time() - payload['timestamp'])
+        snapshot = MetricsSnapshot(**payload)
+        self._encoded = (snapshot, public)
+        self._snapshot = snapshot
+        self._recent.append((self.event_id(snapshot), snapshot))
+
+    def event_id(self, snapshot):
+        return f'{self.epoch}-{snapshot.sequence}'
+
+    def encoded(self, snapshot):
+        current, public = self._encoded
+        if current is snapshot:
+            return public
+        return encode_snapshot(snapshot, self.event_id(snapshot))
+
+    def snapshot_at(self, event_id):
+        # Only snapshots this process has decoded are known here
+        for known_id, snapshot in reversed(self._recent):
+            if known_id == event_id:
+                return snapshot
+        return None
+
+    def wait_for_update(self, sequence, timeout=None):
+        self._ensure_watcher()
+        with self._updated:
+            self._waiters += 1
+            # Wake the watcher if nobody was waiting before
+            self._updated.notify_all()
+            try:
+                self._updated.wait_for(lambda: self.latest().sequence > sequence, timeout)
+            finally:
+                self._waiters -= 1
+        snapshot = self.latest()
+        if snapshot.sequence <= sequence:
+            return None
+        return snapshot
+
+    def _ensure_watcher(self):
+        if self._watcher is not None and self._watcher[0] == os.getpid():
+            return
+        with self._updated:
+            if self._watcher is not None and self._watcher[0] == os.getpid():
+                return
+            thread = threading.Thread(target=self._watch, name='snapshot-watcher', daemon=True)
+            # Remember the owning pid: threads do not survive a fork
+            self._watcher = (os.getpid(), thread)
+            thread.start()
+
+    def _watch(self):
+        # How long after its timestamp a snapshot shows up in the segment
+        delay = 0.0
+        while True:
+            with self._updated:
+                self._updated.wait_for(lambda: self._waiters)
+            try:
+                snapshot = self.latest()
+            except RuntimeError:
+                time.sleep(self.poll_interval)
+                continue
+
+            due = snapshot.monotonic + self.interval + delay
+            time.sleep(max(0.0, due - WAKE_MARGIN - time.monotonic()))
+            while self.latest() is snapshot:
+                late = time.monotonic() > due + WAKE_MARGIN
+                time.sleep(self.poll_interval if late else FINE_POLL_INTERVAL)
+            if self.latest().sequence == snapshot.sequence + 1:
+                delay = min(max(0.0, time.monotonic() - self._snapshot.monotonic), self.interval)
+            with self._updated:
+                self._updated.notify_all()
+
+    def snapshots_since(self, event_id=None):
+        # Workers only see the latest snapshot, so a resume gets that one
+        # unless the client already has it
+        latest = self.latest()
+        if self.parse_event_id(event_id) == latest.sequence:
+            return []
+        return [latest]
+
+    def parse_event_id(self, event_id):
+        try:
+            epoch, sequence = (int(part) for part in event_id.split('-', 1))
+        except (AttributeError, ValueError):
+            return None
+        if epoch != self.epoch:
+            return None
+        return sequence
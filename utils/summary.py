@@ -0,0 +1,291 @@
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from models.metrics_store import metrics_store, LOCAL_HOST, ROLLUP_TIERS
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_METRICS = ('cpu', 'ram')
+QUANTILES = (0.5, 0.95, 0.99)
+ROLLUP_TIER = ROLLUP_TIERS[0]
+# Rollup minutes younger than this may still receive samples from agents
+SETTLE_SECONDS = 120
+
+
+def window_stats(series, metrics, quantiles=QUANTILES):
+    """Quantiles, mean, max and count of many series in one pass.
+
+    ``series`` is a list of ``(samples, metrics)`` arrays, one per host, of
+    any lengths. They are stacked into one NaN-padded
+    ``(hosts, metrics, samples)`` block and sorted along the last axis; NaN
+    sorts last, so the k-th valid value of every series sits at the same
+    index and all quantiles are read with one gather. Interpolation matches
+    ``numpy.quantile``'s default. Returns arrays shaped ``(hosts, metrics,
+    quantiles)`` and ``(hosts, metrics)``; series without samples give NaN.
+    """
+    width = max((len(values) for values in series), default=0)
+    block = np.full((len(series), metrics, max(width, 1)), np.nan, dtype=np.float32)
+    for index, values in enumerate(series):
+        block[index, :, :len(values)] = values.T
+
+    counts = np.count_nonzero(~np.isnan(block), axis=2)
+    block.sort(axis=2)
+    positions = (counts - 1)[..., None] * np.asarray(quantiles)
+    lower = np.floor(positions).astype(np.intp)
+    fraction = positions - lower
+    lower = np.clip(lower, 0, None)
+    upper = np.clip(lower + 1, None, np.maximum(counts - 1, 0)[..., None])
+    low = np.take_along_axis(block, lower, axis=2)
+    high = np.take_along_axis(block, upper, axis=2)
+
+    empty = counts == 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = np.where(empty[..., None], np.nan, low + (high - low) * fraction)
+        mean = np.where(empty, np.nan, np.nansum(block, axis=2, dtype=np.float64) / counts)
+    maximum = np.where(empty, np.nan, np.take_along_axis(block, np.maximum(counts - 1, 0)[..., None], axis=2)[..., 0])
+    return values, mean, maximum, counts
+
+
+def top_k(scores, k):
+    """Indices of the ``k`` largest ``scores``, largest first; NaN never ranks."""
+    ranked = np.flatnonzero(~np.isnan(scores))
+    if k <= 0:
+        return ranked[:0]
+    if len(ranked) > k:
+        ranked = ranked[np.argpartition(scores[ranked], len(ranked) - k)[len(ranked) - k:]]
+    return ranked[np.argsort(scores[ranked], kind='stable')[::-1]]
+
+
+def rollup_stats(series, quantiles=QUANTILES):
+    """window_stats for 1-minute rollups: one ``(minutes, 3)`` array of avg, max and count per series.
+
+    Quantiles are taken over the per-minute averages; mean, max and count
+    are those of the underlying samples. Returns arrays shaped
+    ``(series, quantiles)`` and ``(series,)``.
+    """
+    values = window_stats([minutes[:, :1] for minutes in series], 1, quantiles)[0][:, 0]
+    lengths = np.array([len(minutes) for minutes in series], dtype=np.intp)
+    counts = np.zeros(len(series))
+    maximum = np.full(len(series), np.nan)
+    mean = np.full(len(series), np.nan)
+    if lengths.sum():
+        stacked = np.concatenate(series).astype(float)
+        owner = np.repeat(np.arange(len(series)), lengths)
+        counts = np.bincount(owner, weights=stacked[:, 2], minlength=len(series))
+        totals = np.bincount(owner, weights=np.nan_to_num(stacked[:, 0]) * stacked[:, 2], minlength=len(series))
+        present = lengths > 0
+        starts = np.cumsum(lengths) - lengths
+        maximum[present] = np.fmax.reduceat(stacked[:, 1], starts[present])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(counts > 0, totals / counts, np.nan)
+    return values, mean, maximum, counts
+
+
+class SeriesBuffer:
+    """Timestamps and values of one host, kept in time order for slicing."""
+
+    __slots__ = ('timestamps', 'values', 'start', 'end')
+
+    def __init__(self, metrics, capacity=1024):
+        self.timestamps = np.empty(capacity)
+        self.values = np.empty((capacity, metrics), dtype=np.float32)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def extend(self, timestamps, values):
+        count = len(timestamps)
+        if self.end + count > len(self.timestamps):
+            # Compact, and grow if live data still would not fit
+            live = len(self)
+            capacity = max(len(self.timestamps), 2 * (live + count))
+            grown_times = np.empty(capacity)
+            grown_values = np.empty((capacity, self.values.shape[1]), dtype=np.float32)
+            grown_times[:live] = self.timestamps[self.start:self.end]
+            grown_values[:live] = self.values[self.start:self.end]
+            self.timestamps, self.values, self.start, self.end = grown_times, grown_values, 0, live
+        out_of_order = (len(self) and timestamps.min() < self.timestamps[self.end - 1]) or (np.diff(timestamps) < 0).any()
+        self.timestamps[self.end:self.end + count] = timestamps
+        self.values[self.end:self.end + count] = values
+        self.end += count
+        if out_of_order:
+            # Unsorted agent batch, or a retried one that landed after newer samples
+            order = np.argsort(self.timestamps[self.start:self.end], kind='stable') + self.start
+            self.timestamps[self.start:self.end] = self.timestamps[order]
+            self.values[self.start:self.end] = self.values[order]
+
+    def trim(self, oldest):
+        self.start += int(np.searchsorted(self.timestamps[self.start:self.end], oldest))
+
+    def since(self, oldest):
+        first = self.start + int(np.searchsorted(self.timestamps[self.start:self.end], oldest))
+        return self.values[first:self.end]
+
+
+class MetricSummaries:
+    """Windowed percentiles of every host's metrics, computed in batch.
+
+    Windows of up to ``raw_window`` seconds are summarized from raw samples.
+    Longer ones read the 1-minute rollups: their quantiles are taken over
+    per-minute averages (mean, max and count stay exact) and they cover
+    complete minutes up to SETTLE_SECONDS ago. Both are kept per host in
+    NumPy buffers, ``raw_window`` seconds of samples and ``span`` seconds of
+    minutes, which a background thread refreshes every ``ttl`` seconds by
+    reading only rows newer than its last read. Requests never touch the
+    database, and memory per host does not depend on the sampling rate of
+    long windows. Each window is summarized for all hosts and metrics with
+    one sort (see window_stats); results are reused for ``ttl`` seconds.
+    """
+
+    def __init__(self, store, metrics=SUMMARY_METRICS, span=86400.0, raw_window=900.0, ttl=5.0, batch=50000):
+        self.store = store
+        self.metrics = tuple(metrics)
+        self.span = span
+        self.raw_window = raw_window
+        self.ttl = ttl
+        self.batch = batch
+        self._samples = {}
+        self._rollups = {}
+        self._last_id = None
+        self._rollups_until = None
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._warm = threading.Event()
+        self._refresher = None
+
+    def init_app(self, app):
+        self.span = float(app.config.get('SUMMARY_MAX_WINDOW', self.span))
+        self.raw_window = float(app.config.get('SUMMARY_RAW_WINDOW', self.raw_window))
+        self.ttl = float(app.config.get('SUMMARY_CACHE_SECONDS', self.ttl))
+
+    @property
+    def ready(self):
+        return self._warm.is_set()
+
+    def start(self):
+        if self._refresher is not None and self._refresher[0] == os.getpid():
+            return
+        thread = threading.Thread(target=self._refresh_loop, name='metric-summaries', daemon=True)
+        # Remember the owning pid: threads do not survive a fork
+        self._refresher = (os.getpid(), thread)
+        thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            try:
+                self.refresh(time.time())
+            except Exception:
+                logger.exception('Failed to refresh metric summaries')
+            time.sleep(self.ttl)
+
+    def refresh(self, now):
+        """Read rows stored since the last refresh; reads run outside the lock."""
+        self._refresh_samples(now)
+        self._refresh_rollups(now)
+        self._warm.set()
+
+    def _refresh_samples(self, now):
+        oldest = now - self.raw_window
+        if self._last_id is None:
+            # First load: each host's recent window through the host index
+            # rather than every row since id 0
+            self._last_id = self.store.last_sample_id()
+            for host in [LOCAL_HOST] + [host['host'] for host in self.store.hosts()]:
+                self._extend_samples(self.store.host_samples(host, oldest, self._last_id, self.metrics))
+        while True:
+            rows = self.store.samples_after(self._last_id, self.batch, columns=self.metrics, since=oldest)
+            if not rows:
+                break
+            self._last_id = rows[-1][0]
+            self._extend_samples(rows)
+            if len(rows) < self.batch:
+                break
+        self._trim(self._samples, oldest)
+
+    def _refresh_rollups(self, now):
+        resolution = ROLLUP_TIER.resolution
+        end = (now - SETTLE_SECONDS) // resolution * resolution
+        start = (now - self.span) // resolution * resolution
+        if self._rollups_until is not None:
+            start = max(start, self._rollups_until)
+        while start < end:
+            # An hour of minutes at a time keeps each read small
+            chunk_end = min(end, start + 60 * resolution)
+            rows = self.store.rollups_between(ROLLUP_TIER.name, start, chunk_end, self.metrics)
+            self._extend(self._rollups, [(host, metric) for host, metric, *_ in rows], np.array(
+                [(bucket, avg, high, count) for host, metric, bucket, high, avg, count in rows], dtype=float
+            ))
+            start = self._rollups_until = chunk_end
+        self._trim(self._rollups, now - self.span)
+
+    def _extend_samples(self, rows):
+        # rows are (id, host, timestamp, *metrics)
+        self._extend(self._samples, [row[1] for row in rows], np.array([row[2:] for row in rows], dtype=float))
+
+    def _extend(self, buffers, keys, data):
+        # data holds a timestamp, then the values, for the buffer named by each key
+        groups = {}
+        for index, key in enumerate(keys):
+            groups.setdefault(key, []).append(index)
+        with self._lock:
+            for key, indices in groups.items():
+                buffer = buffers.get(key)
+                if buffer is None:
+                    buffer = buffers[key] = SeriesBuffer(data.shape[1] - 1)
+                buffer.extend(data[indices, 0], data[indices, 1:])
+
+    def _trim(self, buffers, oldest):
+        with self._lock:
+            for name, buffer in list(buffers.items()):
+                buffer.trim(oldest)
+                if not len(buffer):
+                    del buffers[name]
+
+    def summarize(self, windows, quantiles=QUANTILES, now=None):
+        """``{'hosts': [...], 'metrics': ..., 'windows': {name: (quantiles, mean, max, count)}}``.
+
+        ``windows`` maps a name to its length in seconds (at most ``span``).
+        Returns None until the first refresh has loaded the buffers.
+        """
+        now = time.time() if now is None else now
+        key = (tuple(windows.items()), tuple(quantiles))
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[0] < self.ttl:
+                return cached[1]
+            if not self._warm.is_set():
+                return None
+            hosts = sorted(set(self._samples) | {host for host, metric in self._rollups})
+            result = {
+                'hosts': hosts,
+                'metrics': self.metrics,
+                'windows': {
+                    name: self._window(hosts, now - length, length, quantiles) for name, length in windows.items()
+                }
+            }
+            self._cache = {key: (now, result)}
+        return result
+
+    def _window(self, hosts, oldest, length, quantiles):
+        metrics = len(self.metrics)
+        if length <= self.raw_window:
+            empty = np.empty((0, metrics), dtype=np.float32)
+            series = [self._samples[host].since(oldest) if host in self._samples else empty for host in hosts]
+            return window_stats(series, metrics, quantiles)
+        empty = np.empty((0, 3), dtype=np.float32)
+        series = [
+            self._rollups[(host, metric)].since(oldest) if (host, metric) in self._rollups else empty
+            for host in hosts for metric in self.metrics
+        ]
+        values, mean, maximum, counts = rollup_stats(series, quantiles)
+        shape = (len(hosts), metrics)
+        return values.reshape(shape + (len(quantiles),)), mean.reshape(shape), maximum.reshape(shape), counts.reshape(shape)
+
+
+metric_summaries = MetricSummaries(metrics_store)
@@ -2,9 +2,20 @@ import psutil
 import time
 import random
 from datetime import datetime
+from utils.rates import RateEngine
+from utils.process_tracker import ProcessTracker
+from utils.connection_stats import ConnectionStats
+from utils.instrumentation import instrumentation
+
+# Pseudo block devices that only add noise to the per-disk breakdown
+IGNORED_DISK_PREFIXES = ('loop', 'ram')
 
 class SystemMonitor:
     def __init__(self):
+        self.rates = RateEngine()
+        self._device_names = {}
+        self.process_tracker = ProcessTracker(limit=10)
+        self.connection_stats = ConnectionStats()
         self.use_real_data = True
         try:
             psutil.cpu_percent()
@@ -13,11 +24,12 @@ class SystemMonitor:
         except Exception:
             self.use_real_data = False
     
-    def get_cpu_usage(self):
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_cpu_usage')
+    def get_cpu_usage(self, interval=0.1):
         if self.use_real_data:
             try:
                 return {
-                    'percentage': psutil.cpu_percent(interval=0.1),
+                    'percentage': psutil.cpu_percent(interval=interval),
                     'cores': psutil.cpu_count(),
                     'frequency': psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None,
                     'load_avg': psutil.getloadavg() if hasattr(psutil, 'getloadavg') else None
@@ -36,6 +48,7 @@ class SystemMonitor:
             'load_avg': [base_usage/100, base_usage/100, base_usage/100]
         }
     
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_ram_usage')
     def get_ram_usage(self):
         if self.use_real_data:
             try:
@@ -69,17 +82,26 @@ class SystemMonitor:
             'swap_percentage': 5
         }
     
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_disk_usage')
     def get_disk_usage(self):
         if self.use_real_data:
             try:
                 disk = psutil.disk_usage('/')
+                disk_io = psutil.disk_io_counters()
+                rates = self._counter_rates('disk', disk_io, {
+                    'read_speed': 'read_bytes',
+                    'write_speed': 'write_bytes',
+                    'read_ops': 'read_count',
+                    'write_ops': 'write_count'
+                })
                 return {
                     'total': disk.total,
                     'used': disk.used,
                     'free': disk.free,
                     'percentage': (disk.used / disk.total) * 100,
-                    'read_bytes': psutil.disk_io_counters().read_bytes if psutil.disk_io_counters() else 0,
-                    'write_bytes': psutil.disk_io_counters().write_bytes if psutil.disk_io_counters() else 0
+                    'read_speed': rates['1s']['read_speed'],
+                    'write_speed': rates['1s']['write_speed'],
+                    'rates': rates
                 }
             except Exception:
                 return self._simulate_disk_data()
@@ -90,28 +112,47 @@ class SystemMonitor:
         total = 500 * 1024 * 1024 * 1024
         used_percentage = 60 + random.uniform(-10, 20)
         used = total * (used_percentage / 100)
+        rates = self._simulate_rates({
+            'read_speed': random.uniform(1000000, 50000000),
+            'write_speed': random.uniform(500000, 20000000),
+            'read_ops': random.uniform(10, 500),
+            'write_ops': random.uniform(10, 300)
+        })
         return {
             'total': total,
             'used': used,
             'free': total - used,
             'percentage': used_percentage,
-            'read_bytes': random.randint(1000000000, 5000000000),
-            'write_bytes': random.randint(500000000, 2000000000)
+            'read_speed': rates['1s']['read_speed'],
+            'write_speed': rates['1s']['write_speed'],
+            'rates': rates
         }
     
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_network_activity')
     def get_network_activity(self):
         if self.use_real_data:
             try:
                 net_io = psutil.net_io_counters()
-                net_connections = len(psutil.net_connections())
+                connections = self.connection_stats.get()
+                rates = self._counter_rates('net', net_io, {
+                    'upload_speed': 'bytes_sent',
+                    'download_speed': 'bytes_recv',
+                    'packets_sent_rate': 'packets_sent',
+                    'packets_recv_rate': 'packets_recv'
+                })
                 return {
                     'bytes_sent': net_io.bytes_sent,
                     'bytes_recv': net_io.bytes_recv,
                     'packets_sent': net_io.packets_sent,
                     'packets_recv': net_io.packets_recv,
-                    'connections': net_connections,
-                    'upload_speed': random.uniform(1000000, 10000000),
-                    'download_speed': random.uniform(2000000, 20000000)
+                    'connections': connections['total'],
+                    'connection_states': connections['states'],
+                    'listening_ports': connections['listening_ports'],
+                    'upload_speed': rates['1s']['upload_speed'],
+                    'download_speed': rates['1s']['download_speed'],
+                    'packets_sent_rate': rates['1s']['packets_sent_rate'],
+                    'packets_recv_rate': rates['1s']['packets_recv_rate'],
+                    'rates': rates
                 }
             except Exception:
                 return self._simulate_network_data()
@@ -119,30 +160,166 @@ class SystemMonitor:
             return self._simulate_network_data()
     
     def _simulate_network_data(self):
+        rates = self._simulate_rates({
+            'upload_speed': random.uniform(1000000, 10000000),
+            'download_speed': random.uniform(2000000, 20000000),
+            'packets_sent_rate': random.uniform(100, 5000),
+            'packets_recv_rate': random.uniform(100, 8000)
+        })
+        established = random.randint(10, 40)
+        time_wait = random.randint(0, 10)
         return {
             'bytes_sent': random.randint(1000000000, 10000000000),
             'bytes_recv': random.randint(2000000000, 20000000000),
             'packets_sent': random.randint(1000000, 10000000),
             'packets_recv': random.randint(2000000, 20000000),
-            'connections': random.randint(10, 50),
-            'upload_speed': random.uniform(1000000, 10000000),
-            'download_speed': random.uniform(2000000, 20000000)
+            'connections': established + time_wait + 2,
+            'connection_states': {'ESTABLISHED': established, 'TIME_WAIT': time_wait, 'LISTEN': 2},
+            'listening_ports': {'22': 1, '5000': established},
+            'upload_speed': rates['1s']['upload_speed'],
+            'download_speed': rates['1s']['download_speed'],
+            'packets_sent_rate': rates['1s']['packets_sent_rate'],
+            'packets_recv_rate': rates['1s']['packets_recv_rate'],
+            'rates': rates
+        }
+    
+    def _simulate_rates(self, values):
+        # Same {window: {name: rate}} shape as _counter_rates
+        return {window: dict(values) for window in self.rates.windows}
+    
+    def _counter_rates(self, prefix, counters, fields, timestamp=None):
+        # fields maps output name -> counter attribute; returns {window: {name: rate}}
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        windows = list(self.rates.windows)
+        rates = {window: {} for window in windows}
+        for name, attribute in fields.items():
+            key = f'{prefix}.{attribute}'
+            if counters is not None:
+                self.rates.update(key, getattr(counters, attribute), timestamp)
+            current = self.rates.rates(key)
+            for window in windows:
+                rates[window][name] = current[window]
+        return rates
+    
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_devices')
+    def get_devices(self):
+        """Per-core, per-disk and per-NIC breakdown, one column list per field.
+
+        Every kind is ``{'names': [...], field: [...], ...}`` with values in
+        the same order as ``names``, which keeps hosts with hundreds of cores
+        or dozens of interfaces cheap to serialize and easy to filter.
+        """
+        if self.use_real_data:
+            try:
+                timestamp = time.monotonic()
+                return {
+                    'cpu': self._cpu_devices(),
+                    'disk': self._disk_devices(timestamp),
+                    'nic': self._nic_devices(timestamp)
+                }
+            except Exception:
+                return self._simulate_devices()
+        else:
+            return self._simulate_devices()
+    
+    def _cpu_devices(self):
+        percentages = psutil.cpu_percent(percpu=True)
+        return {
+            'names': [f'cpu{index}' for index in range(len(percentages))],
+            'percent': percentages
+        }
+    
+    def _disk_devices(self, timestamp):
+        counters = {
+            name: values for name, values in (psutil.disk_io_counters(perdisk=True) or {}).items()
+            if not name.startswith(IGNORED_DISK_PREFIXES)
+        }
+        fields = {
+            'read_speed': 'read_bytes',
+            'write_speed': 'write_bytes',
+            'read_ops': 'read_count',
+            'write_ops': 'write_count'
+        }
+        if counters and hasattr(next(iter(counters.values())), 'busy_time'):
+            fields['busy'] = 'busy_time'
+        devices = self._device_rates('disk', counters, fields, timestamp)
+        if 'busy' in devices:
+            # busy_time counts milliseconds, so ms/s over 10 is percent busy
+            devices['busy'] = [round(min(100.0, rate / 10), 1) for rate in devices['busy']]
+        return devices
+    
+    def _nic_devices(self, timestamp):
+        counters = psutil.net_io_counters(pernic=True) or {}
+        devices = self._device_rates('net', counters, {
+            'upload_speed': 'bytes_sent',
+            'download_speed': 'bytes_recv',
+            'packets_sent_rate': 'packets_sent',
+            'packets_recv_rate': 'packets_recv',
+            'errors_rate': ('errin', 'errout'),
+            'drops_rate': ('dropin', 'dropout')
+        }, timestamp)
+        stats = psutil.net_if_stats()
+        # Link speed is reported in Mbit/s, 0 when unknown (virtual NICs)
+        devices['link_speed'] = [stats[name].speed if name in stats else 0 for name in devices['names']]
+        devices['utilization'] = [
+            round(max(upload, download) * 8 / (speed * 1e6) * 100, 1) if speed else None
+            for upload, download, speed in zip(devices['upload_speed'], devices['download_speed'], devices['link_speed'])
+        ]
+        return devices
+    
+    def _device_rates(self, prefix, counters, fields, timestamp):
+        # Columnar per-device rates; a field may sum several counters
+        names = sorted(counters)
+        devices = {'names': names}
+        for name in self._device_names.get(prefix, set()) - set(names):
+            # Device went away; a new one with this name starts from scratch
+            for attributes in fields.values():
+                for attribute in (attributes if isinstance(attributes, tuple) else (attributes,)):
+                    self.rates.forget(f'{prefix}:{name}.{attribute}')
+        self._device_names[prefix] = set(names)
+        for field, attributes in fields.items():
+            attributes = attributes if isinstance(attributes, tuple) else (attributes,)
+            column = []
+            for name in names:
+                rate = 0.0
+                for attribute in attributes:
+                    key = f'{prefix}:{name}.{attribute}'
+                    self.rates.update(key, getattr(counters[name], attribute), timestamp)
+                    rate += self.rates.rate(key)
+                column.append(round(rate, 1))
+            devices[field] = column
+        return devices
+    
+    def _simulate_devices(self):
+        cores = [min(100, max(0, 30 + random.uniform(-25, 60))) for _ in range(8)]
+        return {
+            'cpu': {'names': [f'cpu{index}' for index in range(8)], 'percent': [round(core, 1) for core in cores]},
+            'disk': {
+                'names': ['sda'],
+                'read_speed': [round(random.uniform(1000000, 50000000), 1)],
+                'write_speed': [round(random.uniform(500000, 20000000), 1)],
+                'read_ops': [round(random.uniform(10, 500), 1)],
+                'write_ops': [round(random.uniform(10, 300), 1)],
+                'busy': [round(random.uniform(1, 60), 1)]
+            },
+            'nic': {
+                'names': ['eth0', 'lo'],
+                'upload_speed': [round(random.uniform(1000000, 10000000), 1), round(random.uniform(1000, 100000), 1)],
+                'download_speed': [round(random.uniform(2000000, 20000000), 1), round(random.uniform(1000, 100000), 1)],
+                'packets_sent_rate': [round(random.uniform(100, 5000), 1), round(random.uniform(10, 100), 1)],
+                'packets_recv_rate': [round(random.uniform(100, 8000), 1), round(random.uniform(10, 100), 1)],
+                'errors_rate': [0.0, 0.0],
+                'drops_rate': [0.0, 0.0],
+                'link_speed': [1000, 0],
+                'utilization': [round(random.uniform(1, 20), 1), None]
+            }
         }
     
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_processes')
     def get_processes(self):
         if self.use_real_data:
             try:
-                processes = []
-                for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'status']):
-                    try:
-                        pinfo = proc.info
-                        if pinfo['cpu_percent'] is not None and pinfo['memory_percent'] is not None:
-                            processes.append(pinfo)
-                    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                        pass
-                
-                processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
-                return processes[:10]
+                return self.process_tracker.top()
             except Exception:
                 return self._simulate_processes()
         else:
@@ -166,6 +343,7 @@ class SystemMonitor:
         
         return sorted(processes, key=lambda x: x['cpu_percent'], reverse=True)
     
+    @instrumentation.timed('system_monitor_call_duration_seconds', 'get_system_info')
     def get_system_info(self):
         boot_time = None
         if self.use_real_data:
@@ -198,10 +376,10 @@ class SystemMonitor:
         else:
             return f"{minutes}m"
     
-    def check_alerts(self):
+    def check_alerts(self, cpu_data=None, ram_data=None, disk_data=None):
         alerts = []
         
-        cpu_data = self.get_cpu_usage()
+        cpu_data = cpu_data or self.get_cpu_usage()
         if cpu_data['percentage'] > 85:
             alerts.append({
                 'type': 'cpu',
@@ -209,7 +387,7 @@ class SystemMonitor:
                 'severity': 'critical'
             })
         
-        ram_data = self.get_ram_usage()
+        ram_data = ram_data or self.get_ram_usage()
         if ram_data['percentage'] > 90:
             alerts.append({
                 'type': 'memory',
@@ -217,7 +395,7 @@ class SystemMonitor:
                 'severity': 'critical'
             })
         
-        disk_data = self.get_disk_usage()
+        disk_data = disk_data or self.get_disk_usage()
         if disk_data['percentage'] > 95:
             alerts.append({
                 'type': 'disk',
@@ -0,0 +1,164 @@
+"""Compact binary encoding for agent metric batches.
+
+Version 1 layout, little endian:
+
+    header  magic b'NMB', version u8, flags u8, schema id u16, sample count u32
+    body    host: u16 length + UTF-8
+            system_info: u32 length + JSON (length 0 when absent)
+            first timestamp: f64
+            timestamp deltas: int32 milliseconds, one per sample after the first
+            one float32 array of ``count`` values per schema column
+
+With FLAG_ZLIB set the body is zlib-compressed. The schema id names the
+column list, so columns can be added under a new id without a version bump.
+"""
+
+import array
+import itertools
+import json
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+
+MAGIC = b'NMB'
+VERSION = 1
+FLAG_ZLIB = 0x01
+CONTENT_TYPE = 'application/x-metrics-batch'
+
+SCHEMAS = {
+    1: ('cpu', 'ram', 'disk', 'upload', 'download'),
+}
+DEFAULT_SCHEMA = 1
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+HEADER = struct.Struct('<3sBBHI')
+HOST_LENGTH = struct.Struct('<H')
+INFO_LENGTH = struct.Struct('<I')
+FIRST_TIMESTAMP = struct.Struct('<d')
+
+_SWAP = sys.byteorder != 'little'
+
+
+class WireFormatError(ValueError):
+    pass
+
+
+@dataclass
+class Batch:
+    host: str
+    system_info: dict
+    timestamps: list
+    columns: dict
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def rows(self, names):
+        """Row tuples with the given columns, in order, after the timestamp."""
+        try:
+            series = [self.columns[name] for name in names]
+        except KeyError as error:
+            raise WireFormatError(f'Batch has no {error.args[0]!r} column')
+        return list(zip(self.timestamps, *series))
+
+
+def _packed(typecode, values):
+    packed = array.array(typecode, values)
+    if _SWAP:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpacked(typecode, data):
+    values = array.array(typecode)
+    values.frombytes(data)
+    if _SWAP:
+        values.byteswap()
+    return values
+
+
+def encode_batch(host, rows, system_info=None, schema_id=DEFAULT_SCHEMA, compress=False):
+    """Encode ``(timestamp, *columns)`` rows for one host."""
+    width = len(SCHEMAS[schema_id]) + 1
+    columns = list(zip(*rows)) if rows else [()] * width
+    if len(columns) != width:
+        raise WireFormatError(f'Schema {schema_id} rows have {width} values')
+
+    timestamps = columns[0]
+    milliseconds = [round(timestamp * 1000) for timestamp in timestamps]
+    deltas = [later - earlier for earlier, later in zip(milliseconds, milliseconds[1:])]
+
+    host_bytes = host.encode('utf-8')
+    info_bytes = json.dumps(system_info, separators=(',', ':')).encode() if system_info is not None else b''
+    parts = [
+        HOST_LENGTH.pack(len(host_bytes)), host_bytes,
+        INFO_LENGTH.pack(len(info_bytes)), info_bytes,
+        FIRST_TIMESTAMP.pack(timestamps[0] if timestamps else 0.0)
+    ]
+    try:
+        parts.append(_packed('i', deltas))
+    except OverflowError:
+        raise WireFormatError('Samples in one batch must be less than 24 days apart')
+    parts.extend(_packed('f', column) for column in columns[1:])
+
+    body = b''.join(parts)
+    flags = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_ZLIB
+    return HEADER.pack(MAGIC, VERSION, flags, schema_id, len(timestamps)) + body
+
+
+def decode_batch(data):
+    """Decode a batch into per-column arrays; no per-sample objects are built."""
+    if len(data) < HEADER.size:
+        raise WireFormatError('Truncated batch header')
+    magic, version, flags, schema_id, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise WireFormatError('Not a metrics batch')
+    if version != VERSION:
+        raise WireFormatError(f'Unsupported batch version {version}')
+    names = SCHEMAS.get(schema_id)
+    if names is None:
+        raise WireFormatError(f'Unknown batch schema {schema_id}')
+
+    body = memoryview(data)[HEADER.size:]
+    if flags & FLAG_ZLIB:
+        decompressor = zlib.decompressobj()
+        try:
+            body = memoryview(decompressor.decompress(body, MAX_BODY_BYTES))
+        except zlib.error as error:
+            raise WireFormatError(f'Corrupt compressed batch: {error}')
+        if decompressor.unconsumed_tail:
+            raise WireFormatError('Batch body too large')
+
+    try:
+        offset = 0
+        (host_length,) = HOST_LENGTH.unpack_from(body, offset)
+        offset += HOST_LENGTH.size
+        host = bytes(body[offset:offset + host_length]).decode('utf-8')
+        offset += host_length
+        (info_length,) = INFO_LENGTH.unpack_from(body, offset)
+        offset += INFO_LENGTH.size
+        system_info = json.loads(bytes(body[offset:offset + info_length])) if info_length else None
+        offset += info_length
+        (first,) = FIRST_TIMESTAMP.unpack_from(body, offset)
+        offset += FIRST_TIMESTAMP.size
+    except (struct.error, UnicodeDecodeError, ValueError) as error:
+        raise WireFormatError(f'Malformed batch: {error}')
+
+    delta_bytes = max(count - 1, 0) * 4
+    if len(body) - offset != delta_bytes + count * 4 * len(names):
+        raise WireFormatError('Batch length does not match its sample count')
+
+    deltas = _unpacked('i', body[offset:offset + delta_bytes])
+    offset += delta_bytes
+    timestamps = [first + milliseconds / 1000 for milliseconds in itertools.accumulate(deltas, initial=0)] if count else []
+
+    columns = {}
+    for name in names:
+        columns[name] = _unpacked('f', body[offset:offset + count * 4])
+        offset += count * 4
+    return Batch(host, system_info, timestamps, columns)
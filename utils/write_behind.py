@@ -0,0 +1,166 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from utils.instrumentation import instrumentation
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueueFull(RuntimeError):
+    """Raised when ``submit`` times out waiting for room in the queue."""
+
+
+class WriteBehindQueue:
+    """Buffers writes and applies them in batches from a background thread.
+
+    ``submit`` only appends to an in-memory queue and returns a Future, so
+    request threads never wait on the database unless they want to. The
+    future resolves to the writer's result for that item once the batch
+    holding it is committed, so ``submit(...).result()`` waits for
+    durability. After the first item arrives the writer thread waits
+    ``flush_interval`` so a burst lands in one transaction, then passes up
+    to ``batch_size`` items at a time to ``writer``.
+
+    A failed batch is retried one item at a time, so one bad write fails
+    only its own future. Once ``max_pending`` items are queued, ``submit``
+    blocks until the writer catches up. Pending items are flushed at
+    interpreter exit. After ``init_app`` the writer runs inside an
+    application context.
+    """
+
+    def __init__(self, name, writer=None, batch_size=1000, flush_interval=0.05, max_pending=20000):
+        self.name = name
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.app = None
+        self._items = deque()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._owner_pid = None
+        self._stopping = False
+        self._writing = 0
+        atexit.register(self.close)
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = int(app.config.get('WRITE_BEHIND_BATCH', self.batch_size))
+        self.flush_interval = float(app.config.get('WRITE_BEHIND_INTERVAL', self.flush_interval))
+        self.max_pending = int(app.config.get('WRITE_BEHIND_MAX_PENDING', self.max_pending))
+
+    def __len__(self):
+        return len(self._items)
+
+    def submit(self, item, timeout=5.0):
+        future = Future()
+        with self._condition:
+            self._ensure_thread()
+            deadline = time.monotonic() + timeout
+            while len(self._items) >= self.max_pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise WriteBehindQueueFull(f'{self.name} write-behind queue is full')
+                self._condition.wait(remaining)
+            self._items.append((item, future))
+            self._condition.notify_all()
+        return future
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if self._running():
+                while self._items or self._writing:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._condition.wait(remaining)
+                return True
+            batches = []
+            while self._items:
+                batches.append(self._take())
+        # No writer thread in this process (or it already stopped)
+        for batch in batches:
+            self._write(batch)
+        return True
+
+    def close(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._running():
+            self._thread.join(10)
+        self.flush()
+
+    def _running(self):
+        return self._owner_pid == os.getpid() and self._thread.is_alive()
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so each process starts its own
+        if self._running():
+            return
+        self._owner_pid = os.getpid()
+        self._stopping = False
+        self._writing = 0
+        self._thread = threading.Thread(target=self._run, name=f'{self.name}-writer', daemon=True)
+        self._thread.start()
+
+    def _take(self):
+        batch = []
+        while self._items and len(batch) < self.batch_size:
+            batch.append(self._items.popleft())
+        if batch:
+            self._condition.notify_all()
+        return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._items and not self._stopping:
+                    self._condition.wait()
+                if not self._items:
+                    return
+                stopping = self._stopping
+            if not stopping:
+                # Let a burst accumulate into one transaction
+                time.sleep(self.flush_interval)
+            with self._condition:
+                batch = self._take()
+                self._writing += 1
+            try:
+                self._write(batch)
+            finally:
+                with self._condition:
+                    self._writing -= 1
+                    self._condition.notify_all()
+
+    def _apply(self, items):
+        if self.app is None:
+            return self.writer(items)
+        with self.app.app_context():
+            return self.writer(items)
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        try:
+            results = self._apply([item for item, future in batch])
+        except Exception as error:
+            if len(batch) == 1:
+                logger.exception('%s write-behind item failed', self.name)
+                batch[0][1].set_exception(error)
+                return
+            logger.warning('%s write-behind batch of %d failed (%s), retrying one by one', self.name, len(batch), error)
+        else:
+            instrumentation.observe('write_behind_flush_duration_seconds', time.perf_counter() - start, (self.name,))
+            instrumentation.inc('write_behind_items_total', len(batch), (self.name,))
+            for index, (item, future) in enumerate(batch):
+                future.set_result(results[index] if results is not None else None)
+            return
+        for entry in batch:
+            self._write([entry])